@@ -1,10 +1,10 @@
 import {apiGatewayClient} from "../apiGatewayConfig";
 import {logger} from "../../utilities/logger";
-import {TwitchMessageData} from "../../routes/aws/model/getTwitchMessageResponse";
+import {TwitchMessagePage} from "../../routes/aws/model/getTwitchMessageResponse";
 
 const LOG_PREFIX = `API_GATEWAY_REST`;
 
-export async function getTwitchMessageFromApiGateway(queryParams: any, headers: any):Promise<TwitchMessageData[]> {
+export async function getTwitchMessageFromApiGateway(queryParams: any, headers: any):Promise<TwitchMessagePage> {
     try {
 
         const response = await apiGatewayClient.get('/twitch-message',{
@@ -15,6 +15,9 @@ export async function getTwitchMessageFromApiGateway(queryParams: any, headers:
                 ...queryParams,
             }
         })
+        if (!response.data) {
+            return {messages: [], next_cursor: null}
+        }
         return response.data
 
     } catch (error: any) {
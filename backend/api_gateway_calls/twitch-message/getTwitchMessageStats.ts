@@ -0,0 +1,24 @@
+import {apiGatewayClient} from "../apiGatewayConfig";
+import {logger} from "../../utilities/logger";
+import {GetTwitchMessageStatsResponse} from "../../routes/aws/model/getTwitchMessageStatsResponse";
+
+const LOG_PREFIX = `API_GATEWAY_REST`;
+
+export async function getTwitchMessageStatsFromApiGateway(queryParams: any, headers: any):Promise<GetTwitchMessageStatsResponse | null> {
+    try {
+
+        const response = await apiGatewayClient.get('/twitch-message/stats',{
+            headers: {
+                ...headers
+            },
+            params: {
+                ...queryParams,
+            }
+        })
+        return response.data || null
+
+    } catch (error: any) {
+        logger.error(`Error fetching twitch message stats: ${error.message}`, LOG_PREFIX);
+        throw error;
+    }
+}
@@ -0,0 +1,61 @@
+"""
+Runs synthetic SQS batches through messages-post-lambda and reports messages per second of the whole
+parse, classify and store path. The sentiment backend is the local lexicon, messages are bulk inserted
+into a local test database (RDS_HOST & co.) and nothing is sent back to websockets.
+
+    RDS_HOST=localhost RDS_DB_NAME=twitch_test USER_NAME=postgres PASSWORD=... python benchmark_pipeline.py [messages]
+
+The database needs the migrations of backend/aws/rds/migrations.
+"""
+import json
+import os
+import sys
+import time
+import uuid
+
+from lambda_loader import load_lambda, require_local_database
+
+require_local_database()
+# Forced, so the benchmark can never reach the NLP API, the API Gateway route or the send-back Lambda
+os.environ["SENTIMENT_BACKEND"] = "lexicon"
+os.environ["MESSAGES_WRITE_MODE"] = "bulk"
+os.environ["SEND_BACK_ENABLED"] = "false"
+os.environ.setdefault("AWS_DEFAULT_REGION", "eu-central-1")
+
+messages_post_lambda = load_lambda("twitchChatAnalytics-messages-post-lambda")
+
+TEXTS = ["W", "LUL LUL LUL", "what a great play", "this stream is not good", "https://clips.twitch.tv/x", "gg"]
+
+
+def benchmark_pipeline(message_count=10000, batch_size=10):
+    # Message ids are unique per run, otherwise a second run would only hit ON CONFLICT DO NOTHING
+    run_id = uuid.uuid4().hex[:8]
+    events = [
+        {"Records": [
+            {"body": json.dumps({
+                "stream_id": f"benchmark-{run_id}",
+                "broadcaster_user_login": "benchmark",
+                "chatter_user_login": f"chatter{i % 100}",
+                "chatter_user_id": str(i % 100),
+                "chatter_user_name": f"Chatter{i % 100}",
+                "message_text": f"{TEXTS[i % len(TEXTS)]} {i % 50}",
+                "timestamp": "2024-01-01T00:00:00Z",
+                "message_id": f"benchmark-{run_id}-{i}"
+            }), "messageId": f"benchmark-{run_id}-{i}"}
+            for i in range(start, min(start + batch_size, message_count))
+        ]}
+        for start in range(0, message_count, batch_size)
+    ]
+
+    failures = 0
+    started_at = time.perf_counter()
+    for event in events:
+        failures += len(messages_post_lambda.lambda_handler(event, None)["batchItemFailures"])
+    elapsed_seconds = time.perf_counter() - started_at
+
+    print(f"{message_count} messages in {elapsed_seconds:.2f}s | {message_count / elapsed_seconds:,.0f} messages/s")
+    print(f"failed records: {failures}, stream_id of this run: benchmark-{run_id}")
+
+
+if __name__ == "__main__":
+    benchmark_pipeline(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,44 @@
+"""
+Compares lexicon_sentiment with the NLP API results recorded in a JSON lines corpus
+of {"message_text", "sentiment_score", "sentiment_magnitude"} objects, see the readme of
+twitchChatAnalytics-sentiment-layer for the export. Reports how many messages would stay local,
+their label agreement with the API and messages per second, per confidence threshold.
+
+    python benchmark_pre_classifier.py corpus.jsonl [min_confidence ...]
+"""
+import json
+import sys
+import time
+
+import lambda_loader  # noqa: F401 - puts the layers on sys.path
+from sentiment_classification import classify_sentiment
+from sentiment_lexicon import lexicon_sentiment
+
+
+def benchmark_pre_classifier(corpus_path, thresholds=(0.5, 0.75, 0.9)):
+    with open(corpus_path, encoding="utf-8") as corpus:
+        records = [json.loads(line) for line in corpus if line.strip()]
+
+    started_at = time.perf_counter()
+    local_results = [lexicon_sentiment(record["message_text"]) for record in records]
+    elapsed_seconds = time.perf_counter() - started_at
+    print(f"messages: {len(records)} | throughput: {len(records) / elapsed_seconds:,.0f} messages/s")
+
+    for min_confidence in thresholds:
+        covered = 0
+        agreeing = 0
+        for record, result in zip(records, local_results):
+            if result is None or result[2] < min_confidence:
+                continue
+            covered += 1
+            api_label = classify_sentiment(record["sentiment_score"], record["sentiment_magnitude"])
+            agreeing += classify_sentiment(result[0], result[1]) == api_label
+
+        print(
+            f"min confidence {min_confidence}: classified locally {covered} ({covered / max(len(records), 1):.1%}), "
+            f"label agreement with the API {agreeing / max(covered, 1):.1%}"
+        )
+
+
+if __name__ == "__main__":
+    benchmark_pre_classifier(sys.argv[1], [float(value) for value in sys.argv[2:]] or (0.5, 0.75, 0.9))
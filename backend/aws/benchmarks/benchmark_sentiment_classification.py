@@ -0,0 +1,35 @@
+"""
+Compares the throughput of the scalar and the vectorized sentiment classifiers of the sentiment layer.
+Correctness is covered by backend/aws/lambda/tests/test_sentiment_classification.py.
+
+    python benchmark_sentiment_classification.py [pairs]
+"""
+import sys
+import time
+
+import numpy as np
+
+import lambda_loader  # noqa: F401 - puts the layers on sys.path
+from sentiment_classification import classify_sentiment, classify_sentiment_batch
+
+
+def benchmark_classification(count=1_000_000, seed=0):
+    rng = np.random.default_rng(seed)
+    scores = rng.uniform(-1, 1, count)
+    magnitudes = rng.uniform(0, 8, count)
+
+    started_at = time.perf_counter()
+    classify_sentiment_batch(scores, magnitudes)
+    vectorized_seconds = time.perf_counter() - started_at
+
+    started_at = time.perf_counter()
+    for score, magnitude in zip(scores.tolist(), magnitudes.tolist()):
+        classify_sentiment(score, magnitude)
+    scalar_seconds = time.perf_counter() - started_at
+
+    print(f"pairs: {count}")
+    print(f"scalar: {count / scalar_seconds:,.0f} pairs/s | vectorized: {count / vectorized_seconds:,.0f} pairs/s")
+
+
+if __name__ == "__main__":
+    benchmark_classification(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,60 @@
+"""
+Inserts rounds of stream_metadata snapshots, one 5-minute tick of many live streams each,
+once per row and once per batch like post-stream-metadata does, and reports rows per second.
+Needs a local test database (RDS_HOST & co.) migrated with backend/aws/rds/migrations, the rows are rolled back.
+
+    RDS_HOST=localhost RDS_DB_NAME=twitch_test USER_NAME=postgres PASSWORD=... python benchmark_stream_metadata_inserts.py
+"""
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from psycopg2.extras import execute_values
+
+from lambda_loader import load_lambda, require_local_database
+from rds_connection import get_connection
+
+require_local_database()
+
+post_stream_metadata = load_lambda("twitchChatAnalytics-post-stream-metadata")
+INSERT_COLUMNS = post_stream_metadata.INSERT_COLUMNS
+STREAM_METADATA_FIELDS = post_stream_metadata.STREAM_METADATA_FIELDS
+
+
+def insert_rows(conn, snapshots):
+    with conn.cursor() as cur:
+        for snapshot in snapshots:
+            cur.execute(f"""
+                INSERT INTO stream_metadata ({INSERT_COLUMNS}) VALUES ({", ".join(["%s"] * len(snapshot))})
+                ON CONFLICT (stream_id, timestamp) DO NOTHING
+            """, snapshot)
+
+
+def insert_batch(conn, snapshots):
+    with conn.cursor() as cur:
+        execute_values(cur, f"""
+            INSERT INTO stream_metadata ({INSERT_COLUMNS}) VALUES %s
+            ON CONFLICT (stream_id, timestamp) DO NOTHING
+        """, snapshots, page_size=len(snapshots))
+
+
+def benchmark_inserts(stream_count=500, rounds=20):
+    counters = [10] * (len(STREAM_METADATA_FIELDS) - 1)
+    ticks = [
+        [(f"benchmark-{stream}", datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=5 * tick), "benchmark", *counters)
+         for stream in range(stream_count)]
+        for tick in range(rounds)
+    ]
+    conn = get_connection()
+
+    for name, insert in [("per row", insert_rows), ("batched", insert_batch)]:
+        started_at = time.perf_counter()
+        for snapshots in ticks:
+            insert(conn, snapshots)
+        elapsed_seconds = time.perf_counter() - started_at
+        conn.rollback()
+        print(f"{name}: {stream_count * rounds / elapsed_seconds:,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    benchmark_inserts(*(int(value) for value in sys.argv[1:3]))
@@ -0,0 +1,63 @@
+"""
+Compares one conditional update_item per user (add_user_info_to_db) with the BatchWriteItem
+re-sync (sync_user_roles) of the authorization Lambda against a local DynamoDB stand-in.
+
+    DYNAMODB_ENDPOINT_URL=http://localhost:8000 python benchmark_user_roles.py [users]
+
+The UserRoles table is created on the stand-in when it is missing.
+"""
+import os
+import sys
+import time
+
+if not os.environ.get("DYNAMODB_ENDPOINT_URL"):
+    sys.exit("DYNAMODB_ENDPOINT_URL must point at a local DynamoDB, refusing to write to AWS")
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "eu-central-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "local")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "local")
+
+from lambda_loader import load_lambda
+
+authorization = load_lambda("twitchChatAnalytics-authorization")
+
+
+def ensure_table():
+    client = authorization.dynamodb.meta.client
+    if authorization.TABLE_NAME in client.list_tables()["TableNames"]:
+        return
+    client.create_table(
+        TableName=authorization.TABLE_NAME,
+        KeySchema=[
+            {"AttributeName": "CognitoUsername", "KeyType": "HASH"},
+            {"AttributeName": "BroadcasterUserLogin", "KeyType": "RANGE"},
+        ],
+        AttributeDefinitions=[
+            {"AttributeName": "CognitoUsername", "AttributeType": "S"},
+            {"AttributeName": "BroadcasterUserLogin", "AttributeType": "S"},
+        ],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    client.get_waiter("table_exists").wait(TableName=authorization.TABLE_NAME)
+
+
+def benchmark_user_roles(users=1000):
+    ensure_table()
+    user_roles = {f"benchmark-user-{i}": "Moderator" if i % 10 == 0 else "Viewer" for i in range(users)}
+
+    started_at = time.perf_counter()
+    for cognito_username, role in user_roles.items():
+        authorization.add_user_info_to_db(cognito_username, "benchmark-single", role)
+    single_seconds = time.perf_counter() - started_at
+
+    started_at = time.perf_counter()
+    authorization.sync_user_roles("benchmark-batch", user_roles)
+    batch_seconds = time.perf_counter() - started_at
+
+    print(f"users: {users}")
+    print(f"single writes: {single_seconds:.2f}s ({users / single_seconds:,.0f} users/s)")
+    print(f"batch re-sync: {batch_seconds:.2f}s ({users / batch_seconds:,.0f} users/s)")
+
+
+if __name__ == "__main__":
+    benchmark_user_roles(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,30 @@
+import importlib.util
+import os
+import sys
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lambda")
+LAYERS = [
+    "twitchChatAnalytics-rds-connection-layer",
+    "twitchChatAnalytics-sentiment-layer",
+]
+
+for layer in LAYERS:
+    sys.path.insert(0, os.path.join(LAMBDA_DIR, layer, "python"))
+
+LOCAL_DATABASE_HOSTS = ("localhost", "127.0.0.1", "::1")
+
+
+def require_local_database():
+    """Exits unless RDS_HOST points at a database on this machine (TCP loopback or a unix socket directory)"""
+    host = os.environ.get("RDS_HOST", "")
+    if host not in LOCAL_DATABASE_HOSTS and not host.startswith("/"):
+        sys.exit(f"RDS_HOST must point at a local test database, refusing to run against '{host}'")
+
+
+def load_lambda(name):
+    """Imports a Lambda from backend/aws/lambda/<name>/<name>.py with the layers on sys.path, like the runtime"""
+    path = os.path.join(LAMBDA_DIR, name, f"{name}.py")
+    spec = importlib.util.spec_from_file_location(name.replace("-", "_"), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
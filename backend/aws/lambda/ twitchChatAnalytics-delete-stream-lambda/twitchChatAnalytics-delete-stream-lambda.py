@@ -1,50 +1,67 @@
 import json
 import os
-import psycopg2
 from psycopg2.extras import RealDictCursor
+from rds_connection import get_cursor
+from message_partitions import STREAM_START_BOUND
 
-DB_HOST = os.environ['RDS_HOST']
-DB_PORT = os.environ.get('RDS_PORT')
-DB_NAME = os.environ['RDS_DB_NAME']
-DB_USER = os.environ['USER_NAME']
-DB_PASSWORD = os.environ['PASSWORD']
+# Waiting for a conflicting lock longer than this aborts the delete instead of queueing writers behind it
+DELETE_LOCK_TIMEOUT = os.environ.get('DELETE_LOCK_TIMEOUT', '5s')
 
 def delete_stream_and_metadata(stream_id, broadcaster_username):
+    """
+    Deletes a stream with its metadata snapshots, messages and message rollups in one transaction.
+    Messages are bounded by the stream start, so only the monthly partitions since then are searched
+    through their (broadcaster_user_login, stream_id, timestamp) index and only the deleted rows are locked.
+    """
     try:
-        with psycopg2.connect(
-                host=DB_HOST,
-                port=DB_PORT,
-                database=DB_NAME,
-                user=DB_USER,
-                password=DB_PASSWORD
-        ) as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                query_streams = """
-                DELETE FROM streams
-                WHERE stream_id = %s AND broadcaster_username = %s
-                """
-                cursor.execute(query_streams, (stream_id, broadcaster_username))
-                streams_deleted = cursor.rowcount
-
-                if streams_deleted == 0:
-                    return {
-                        "streams_deleted": 0,
-                        "metadata_deleted": 0
-                    }
-
-                query_metadata = """
-                DELETE FROM stream_metadata
-                WHERE stream_id = %s
-                """
-                cursor.execute(query_metadata, (stream_id,))
-                metadata_deleted = cursor.rowcount
-
-                conn.commit()
+        with get_cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute("SELECT set_config('lock_timeout', %s, true)", (DELETE_LOCK_TIMEOUT,))
 
+            # Checks ownership and keeps started_at, which bounds the messages, until the end of the transaction
+            query_stream = """
+            SELECT stream_id
+            FROM streams
+            WHERE stream_id = %s AND broadcaster_username = %s
+            FOR UPDATE
+            """
+            cursor.execute(query_stream, (stream_id, broadcaster_username))
+            if cursor.fetchone() is None:
                 return {
-                    "streams_deleted": streams_deleted,
-                    "metadata_deleted": metadata_deleted
+                    "streams_deleted": 0,
+                    "metadata_deleted": 0,
+                    "messages_deleted": 0
                 }
+
+            query_messages = f"""
+            DELETE FROM messages
+            WHERE broadcaster_user_login = %s AND stream_id = %s
+              AND timestamp >= ({STREAM_START_BOUND})
+            """
+            cursor.execute(query_messages, (broadcaster_username, stream_id, stream_id))
+            messages_deleted = cursor.rowcount
+
+            query_metadata = """
+            DELETE FROM stream_metadata
+            WHERE stream_id = %s
+            """
+            cursor.execute(query_metadata, (stream_id,))
+            metadata_deleted = cursor.rowcount
+
+            cursor.execute("DELETE FROM stream_message_rollups WHERE stream_id = %s", (stream_id,))
+            cursor.execute("DELETE FROM stream_rollup_chatters WHERE stream_id = %s", (stream_id,))
+
+            query_streams = """
+            DELETE FROM streams
+            WHERE stream_id = %s AND broadcaster_username = %s
+            """
+            cursor.execute(query_streams, (stream_id, broadcaster_username))
+            streams_deleted = cursor.rowcount
+
+            return {
+                "streams_deleted": streams_deleted,
+                "metadata_deleted": metadata_deleted,
+                "messages_deleted": messages_deleted
+            }
     except Exception as e:
         print(f"Error querying the database: {e}")
         raise
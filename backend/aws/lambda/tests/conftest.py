@@ -0,0 +1,36 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+LAYERS = [
+    "twitchChatAnalytics-rds-connection-layer",
+    "twitchChatAnalytics-sentiment-layer",
+]
+
+# Lambdas create their boto3 clients at import time
+os.environ.setdefault("AWS_DEFAULT_REGION", "eu-central-1")
+
+for layer in LAYERS:
+    sys.path.insert(0, os.path.join(LAMBDA_DIR, layer, "python"))
+
+
+@pytest.fixture
+def load_lambda():
+    """Imports a Lambda from <name>/<name>.py as a fresh module, so its caches start empty"""
+    def load(name):
+        # The delete-stream directory name starts with a space, its file name does not
+        path = os.path.join(LAMBDA_DIR, name, f"{name.strip()}.py")
+        spec = importlib.util.spec_from_file_location(name.strip().replace("-", "_"), path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    return load
+
+
+@pytest.fixture
+def fixture_path():
+    return lambda name: os.path.join(FIXTURES_DIR, name)
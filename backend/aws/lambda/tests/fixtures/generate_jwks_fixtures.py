@@ -0,0 +1,46 @@
+"""
+Regenerates the offline Cognito fixtures: jwks.json with one public key, jwks-rotated.json
+with a second one added, and tokens signed by each key for the streamer authorizer tests.
+The private keys are throwaway and not kept.
+
+    python generate_jwks_fixtures.py
+"""
+import json
+import os
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+
+REGION = "eu-central-1"
+USER_POOL_ID = "eu-central-1_IzUkrEEsr"
+ISSUER = f"https://cognito-idp.{REGION}.amazonaws.com/{USER_POOL_ID}"
+FIXTURES_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def public_jwk(private_key, kid):
+    jwk = json.loads(RSAAlgorithm.to_jwk(private_key.public_key()))
+    return {**jwk, "kid": kid, "alg": "RS256", "use": "sig"}
+
+
+def signed_token(private_key, kid):
+    claims = {"iss": ISSUER, "cognito:username": "fixture-user", "token_use": "access"}
+    return jwt.encode(claims, private_key, algorithm="RS256", headers={"kid": kid})
+
+
+def write(name, content):
+    with open(os.path.join(FIXTURES_DIR, name), "w") as fixture:
+        fixture.write(content)
+
+
+if __name__ == "__main__":
+    current_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    rotated_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    write("jwks.json", json.dumps({"keys": [public_jwk(current_key, "fixture-key-1")]}, indent=2) + "\n")
+    write("jwks-rotated.json", json.dumps({"keys": [
+        public_jwk(current_key, "fixture-key-1"),
+        public_jwk(rotated_key, "fixture-key-2"),
+    ]}, indent=2) + "\n")
+    write("token.jwt", signed_token(current_key, "fixture-key-1") + "\n")
+    write("token-rotated.jwt", signed_token(rotated_key, "fixture-key-2") + "\n")
@@ -0,0 +1,94 @@
+import pytest
+
+AUTHORIZER = "twitchChatAnalytics-cognito-authorizer-streamer"
+METHOD_ARN = "arn:aws:execute-api:eu-central-1:123456789012:abcdef/dev/GET/streams"
+
+
+@pytest.fixture
+def authorizer(load_lambda, fixture_path, monkeypatch):
+    module = load_lambda(AUTHORIZER)
+    monkeypatch.setattr(module, "JWKS_FILE", fixture_path("jwks.json"))
+    monkeypatch.setattr(module, "get_cached_user_role", lambda username, broadcaster: "Streamer")
+
+    original_fetch = module.fetch_jwks
+    module.fetches = []
+
+    def counting_fetch():
+        module.fetches.append(module.JWKS_FILE)
+        return original_fetch()
+
+    monkeypatch.setattr(module, "fetch_jwks", counting_fetch)
+    return module
+
+
+def authorize(authorizer, token_path):
+    with open(token_path) as token_file:
+        token = token_file.read().strip()
+    event = {
+        "headers": {"Authorization": f"Bearer {token}", "BroadcasterUserLogin": "broadcaster"},
+        "methodArn": METHOD_ARN
+    }
+    return authorizer.lambda_handler(event, None)["policyDocument"]["Statement"][0]["Effect"]
+
+
+def expire_refresh_interval(authorizer):
+    authorizer.jwks_refresh_attempted_at -= authorizer.JWKS_MIN_REFRESH_INTERVAL_SECONDS + 1
+
+
+def test_known_kid_is_served_from_cache(authorizer, fixture_path):
+    assert authorize(authorizer, fixture_path("token.jwt")) == "Allow"
+    assert authorize(authorizer, fixture_path("token.jwt")) == "Allow"
+
+    assert len(authorizer.fetches) == 1
+
+
+def test_unknown_kid_refreshes_once_per_interval(authorizer, fixture_path):
+    assert authorize(authorizer, fixture_path("token.jwt")) == "Allow"
+    expire_refresh_interval(authorizer)
+
+    for _ in range(5):
+        assert authorize(authorizer, fixture_path("token-rotated.jwt")) == "Deny"
+
+    assert len(authorizer.fetches) == 2
+
+
+def test_key_rotation_is_picked_up_on_refresh(authorizer, fixture_path, monkeypatch):
+    assert authorize(authorizer, fixture_path("token.jwt")) == "Allow"
+
+    monkeypatch.setattr(authorizer, "JWKS_FILE", fixture_path("jwks-rotated.json"))
+    expire_refresh_interval(authorizer)
+
+    assert authorize(authorizer, fixture_path("token-rotated.jwt")) == "Allow"
+    assert authorize(authorizer, fixture_path("token.jwt")) == "Allow"
+    assert len(authorizer.fetches) == 2
+
+
+def test_ttl_expiry_refreshes(authorizer, fixture_path):
+    assert authorize(authorizer, fixture_path("token.jwt")) == "Allow"
+    authorizer.jwks_fetched_at -= authorizer.JWKS_CACHE_TTL_SECONDS
+    expire_refresh_interval(authorizer)
+
+    assert authorize(authorizer, fixture_path("token.jwt")) == "Allow"
+    assert len(authorizer.fetches) == 2
+
+
+def test_failed_cold_start_fetch_is_retried_quickly(authorizer, fixture_path, monkeypatch):
+    monkeypatch.setattr(authorizer, "JWKS_FILE", fixture_path("missing-jwks.json"))
+    assert authorize(authorizer, fixture_path("token.jwt")) == "Deny"
+    assert authorizer.jwks_fetched_at is None
+
+    monkeypatch.setattr(authorizer, "JWKS_FILE", fixture_path("jwks.json"))
+    authorizer.jwks_refresh_attempted_at -= authorizer.JWKS_EMPTY_RETRY_INTERVAL_SECONDS
+
+    assert authorize(authorizer, fixture_path("token.jwt")) == "Allow"
+
+
+def test_failed_refresh_keeps_previous_keys(authorizer, fixture_path, monkeypatch):
+    assert authorize(authorizer, fixture_path("token.jwt")) == "Allow"
+
+    monkeypatch.setattr(authorizer, "JWKS_FILE", fixture_path("missing-jwks.json"))
+    authorizer.jwks_fetched_at -= authorizer.JWKS_CACHE_TTL_SECONDS
+    expire_refresh_interval(authorizer)
+
+    assert authorize(authorizer, fixture_path("token.jwt")) == "Allow"
+    assert len(authorizer.fetches) == 2
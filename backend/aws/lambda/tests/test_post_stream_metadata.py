@@ -0,0 +1,67 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("psycopg2")
+pytest.importorskip("dateutil")
+
+
+def record(message_id, **fields):
+    body = {"stream_id": "stream", "timestamp": f"2024-01-01T00:{message_id:02d}:00Z", "category": "Just Chatting"}
+    body.update(fields)
+    return {"messageId": str(message_id), "body": json.dumps(body)}
+
+
+@pytest.fixture
+def post_stream_metadata(load_lambda, monkeypatch):
+    # rds_connection reads its settings at import, no connection is opened by these tests
+    for name in ("USER_NAME", "PASSWORD", "RDS_HOST", "RDS_DB_NAME"):
+        if name not in os.environ:
+            monkeypatch.setenv(name, "unused")
+    module = load_lambda("twitchChatAnalytics-post-stream-metadata")
+    module.inserted = []
+
+    def insert(snapshots):
+        # Stands in for the database: a snapshot with category "rejected" fails the whole statement
+        if any(snapshot[2] == "rejected" for snapshot in snapshots):
+            raise Exception("value too long for type character varying(255)")
+        module.inserted.extend(snapshots)
+
+    module.insert_snapshots_to_postgresql_db = insert
+    return module
+
+
+def test_invalid_count_fails_only_its_record(post_stream_metadata):
+    records = [record(i, viewer_count=i, message_count=str(i)) for i in range(36)]
+    records.append(record(36, viewer_count="lots"))
+
+    response = post_stream_metadata.lambda_handler({"Records": records}, None)
+
+    assert response == {"batchItemFailures": [{"itemIdentifier": "36"}]}
+    assert len(post_stream_metadata.inserted) == 36
+
+
+def test_counts_are_converted_to_int(post_stream_metadata):
+    response = post_stream_metadata.lambda_handler({"Records": [record(1, viewer_count="12", follower_count=3.0)]}, None)
+
+    assert response == {"batchItemFailures": []}
+    row = dict(zip(["stream_id", "timestamp"] + post_stream_metadata.STREAM_METADATA_FIELDS,
+                   post_stream_metadata.inserted[0]))
+    assert row["viewer_count"] == 12 and row["follower_count"] == 3 and row["message_count"] == 0
+
+
+@pytest.mark.parametrize("value", ["lots", -1, 1.5, True, 2**31, [1]])
+def test_invalid_counts_are_rejected(post_stream_metadata, value):
+    with pytest.raises(ValueError):
+        post_stream_metadata.parse_snapshot(record(1, message_count=value))
+
+
+def test_failed_batch_insert_falls_back_to_single_rows(post_stream_metadata):
+    records = [record(i) for i in range(10)]
+    records.insert(4, record(10, category="rejected"))
+
+    response = post_stream_metadata.lambda_handler({"Records": records}, None)
+
+    assert response == {"batchItemFailures": [{"itemIdentifier": "10"}]}
+    assert len(post_stream_metadata.inserted) == 10
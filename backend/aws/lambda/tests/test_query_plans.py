@@ -0,0 +1,335 @@
+"""
+Query plan regression check: runs the database Lambdas against seeded tables and EXPLAINs every
+statement they execute, failing as soon as one needs a sequential scan. Upserts must also keep
+resolving their conflicts through the expected unique index.
+
+Runs only against a local database migrated with backend/aws/rds/migrations (RDS_HOST, RDS_DB_NAME,
+USER_NAME, PASSWORD like the Lambdas). Everything happens in one transaction that is rolled back.
+"""
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+pytest.importorskip("numpy")
+
+from psycopg2.extras import execute_values  # noqa: E402
+from message_rollups import update_message_rollups  # noqa: E402
+from sentiment_classification import classify_sentiment_batch  # noqa: E402
+
+LOCAL_DATABASE_HOSTS = ("localhost", "127.0.0.1", "::1")
+
+pytestmark = pytest.mark.skipif(
+    not (os.environ.get("RDS_HOST", "") in LOCAL_DATABASE_HOSTS or os.environ.get("RDS_HOST", "").startswith("/")),
+    reason="needs RDS_HOST pointing at a local database migrated with backend/aws/rds/migrations"
+)
+
+BROADCASTER = "broadcaster"
+STREAM_STARTS = {
+    "stream-1": datetime(2024, 1, 20, 18, tzinfo=timezone.utc),
+    "stream-2": datetime(2024, 2, 20, 18, tzinfo=timezone.utc),
+    "stream-3": datetime(2024, 3, 20, 18, tzinfo=timezone.utc),
+}
+MESSAGES_PER_STREAM = 2000
+SNAPSHOTS_PER_STREAM = 48
+
+
+def seq_scans(plan):
+    """Returns the relations read by a Seq Scan node anywhere in an EXPLAIN (FORMAT JSON) plan"""
+    found = []
+    if isinstance(plan, dict):
+        if plan.get("Node Type") == "Seq Scan":
+            found.append(plan.get("Relation Name"))
+        for value in plan.values():
+            found.extend(seq_scans(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            found.extend(seq_scans(value))
+    return found
+
+
+def conflict_arbiters(plans):
+    """Returns the unique indexes the INSERT ... ON CONFLICT statements of the plans resolve conflicts with"""
+    found = set()
+    for _, plan in plans:
+        for node in plan:
+            found.update(node["Plan"].get("Conflict Arbiter Indexes", []))
+    return found
+
+
+class ExplainingCursor:
+    """Cursor proxy recording the EXPLAIN plan of every statement before running it"""
+
+    def __init__(self, cursor, plans):
+        object.__setattr__(self, "_cursor", cursor)
+        object.__setattr__(self, "_plans", plans)
+
+    def execute(self, query, params=None):
+        statement = self._cursor.mogrify(query, params)
+        with self._cursor.connection.cursor() as explain:
+            explain.execute(b"EXPLAIN (FORMAT JSON) " + statement)
+            self._plans.append((statement.decode(), explain.fetchone()[0]))
+        return self._cursor.execute(query, params)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+def seed(cur):
+    """Seeds three streams of one broadcaster, one per month, with messages, rollups and metadata snapshots"""
+    cur.execute("SELECT create_messages_partitions(%s, %s)", ("2024-01-01", "2024-03-01"))
+
+    messages = []
+    for stream_id, started_at in STREAM_STARTS.items():
+        cur.execute("""
+            INSERT INTO streams (stream_id, broadcaster_username, started_at, ended_at)
+            VALUES (%s, %s, %s, %s)
+        """, (stream_id, BROADCASTER, started_at, started_at + timedelta(hours=4)))
+
+        for i in range(MESSAGES_PER_STREAM):
+            # Scores spread over the whole scale, every third label is stale so reclassification moves rollups
+            score = (i % 21) / 10 - 1
+            messages.append({
+                "stream_id": stream_id,
+                "broadcaster_user_login": BROADCASTER,
+                "chatter_user_login": f"chatter-{i % 40}",
+                "message_text": f"message {i}",
+                "timestamp": started_at + timedelta(seconds=7 * i),
+                "nlp_classification": "neutral" if i % 3 == 0 else None,
+                "sentiment_score": score,
+                "sentiment_magnitude": abs(score) * 2,
+                "message_id": f"{stream_id}-{i}",
+            })
+
+        cur.executemany("""
+            INSERT INTO stream_metadata (stream_id, timestamp, viewer_count, message_count, category)
+            VALUES (%s, %s, %s, %s, %s)
+        """, [
+            (stream_id, started_at + timedelta(minutes=5 * i), 100 + i, 40, "Just Chatting")
+            for i in range(SNAPSHOTS_PER_STREAM)
+        ])
+
+    labels = classify_sentiment_batch([m["sentiment_score"] for m in messages],
+                                      [m["sentiment_magnitude"] for m in messages]).tolist()
+    for message, label in zip(messages, labels):
+        message["nlp_classification"] = message["nlp_classification"] or label
+
+    execute_values(cur, """
+        INSERT INTO messages (stream_id, broadcaster_user_login, chatter_user_login, message_text, timestamp,
+                              nlp_classification, sentiment_score, sentiment_magnitude, message_id)
+        VALUES %s
+    """, [
+        (m["stream_id"], m["broadcaster_user_login"], m["chatter_user_login"], m["message_text"], m["timestamp"],
+         m["nlp_classification"], m["sentiment_score"], m["sentiment_magnitude"], m["message_id"])
+        for m in messages
+    ], page_size=1000)
+    update_message_rollups(cur, messages)
+
+    cur.execute("ANALYZE streams, messages, stream_metadata, stream_message_rollups, stream_rollup_chatters")
+
+
+@pytest.fixture
+def database():
+    """One seeded transaction with sequential scans disabled, rolled back at the end"""
+    conn = psycopg2.connect(
+        host=os.environ["RDS_HOST"],
+        port=int(os.environ.get("RDS_PORT", 5432)),
+        dbname=os.environ.get("RDS_DB_NAME", "postgres"),
+        user=os.environ.get("USER_NAME"),
+        password=os.environ.get("PASSWORD"),
+    )
+    try:
+        with conn.cursor() as cur:
+            seed(cur)
+            # The planner only picks a sequential scan when no index can serve the query,
+            # so the check does not depend on how much data is seeded
+            cur.execute("SET LOCAL enable_seqscan = off")
+        yield conn
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+@pytest.fixture
+def run_lambda(load_lambda, database):
+    """Loads a Lambda with get_cursor bound to the seeded transaction, returns its handler and the recorded plans"""
+    def load(name):
+        plans = []
+
+        @contextmanager
+        def get_cursor(cursor_factory=None, name=None):
+            cur = database.cursor(name=name, cursor_factory=cursor_factory)
+            try:
+                yield ExplainingCursor(cur, plans)
+            finally:
+                cur.close()
+
+        module = load_lambda(name)
+        module.get_cursor = get_cursor
+        return module, plans
+    return load
+
+
+def event(headers=True, **query):
+    return {
+        "headers": {"BroadcasterUserLogin": BROADCASTER} if headers else {},
+        "queryStringParameters": query,
+    }
+
+
+def assert_no_seq_scan(plans):
+    assert plans, "no statement was executed"
+    for statement, plan in plans:
+        scanned = seq_scans(plan)
+        assert not scanned, f"Sequential scan on {scanned} in:\n{statement}"
+
+
+@pytest.mark.parametrize("query", [
+    {"chatter_user_login": "chatter-1", "start_time": "2024-01-20T18:00:00Z", "end_time": "2024-01-21T00:00:00Z"},
+    {"stream_id": "stream-2", "chatter_user_login": "chatter-1"},
+    {"stream_id": "stream-2"},
+    {"start_time": "2024-03-20T18:00:00Z", "end_time": "2024-03-21T00:00:00Z", "limit": "100"},
+])
+def test_get_messages_data(run_lambda, query):
+    module, plans = run_lambda("twitchChatAnalytics-get-messages-data")
+    response = module.lambda_handler(event(**query), None)
+    assert response["statusCode"] == 200, response
+    assert_no_seq_scan(plans)
+
+
+@pytest.mark.parametrize("query", [
+    {"stream_id": "stream-2"},
+    {"stream_id": "stream-2", "chatter_user_login": "chatter-1"},
+    {"start_time": "2024-03-20T18:00:00Z", "end_time": "2024-03-21T00:00:00Z", "bucket": "1m"},
+    {"stream_id": "stream-2", "summary": "true"},
+])
+def test_get_messages_stats(run_lambda, query):
+    module, plans = run_lambda("twitchChatAnalytics-get-messages-stats")
+    response = module.lambda_handler(event(**query), None)
+    assert response["statusCode"] == 200, response
+    assert_no_seq_scan(plans)
+
+
+@pytest.mark.parametrize("query", [{}, {"stream_id": "stream-1"}])
+def test_get_stream(run_lambda, query):
+    module, plans = run_lambda("twitchChatAnalytics-get-stream")
+    response = module.lambda_handler(event(**query), None)
+    assert response["statusCode"] == 200, response
+    assert_no_seq_scan(plans)
+
+
+@pytest.mark.parametrize("query", [
+    {"stream_id": "stream-1", "fields": "viewer_count,message_count,category"},
+    {"stream_id": "stream-1", "from": "2024-01-20T19:00:00Z", "to": "2024-01-20T21:00:00Z", "resolution": "600"},
+])
+def test_get_stream_metadata(run_lambda, query):
+    module, plans = run_lambda("twitchChatAnalytics-get-stream-metadata")
+    response = module.lambda_handler(event(**query), None)
+    assert response["statusCode"] == 200, response
+    assert_no_seq_scan(plans)
+
+
+def test_delete_stream(run_lambda):
+    module, plans = run_lambda(" twitchChatAnalytics-delete-stream-lambda")
+    response = module.lambda_handler(event(stream_id="stream-2"), None)
+    assert response["statusCode"] == 200, response
+    assert json.loads(response["body"])["details"]["messages_deleted"] == MESSAGES_PER_STREAM
+    assert_no_seq_scan(plans)
+
+
+def test_reclassify_messages(run_lambda):
+    module, plans = run_lambda("twitchChatAnalytics-reclassify-messages")
+    response = module.lambda_handler({"job_name": "query-plans", "restart": True, "chunk_size": 1000}, None)
+    assert response["statusCode"] == 200, response
+    body = json.loads(response["body"])
+    assert body["done"] and body["updated"] > 0
+    assert_no_seq_scan(plans)
+
+
+def new_messages(count, stream_id="stream-2"):
+    started_at = STREAM_STARTS[stream_id]
+    return [
+        {
+            "stream_id": stream_id,
+            "broadcaster_user_login": BROADCASTER,
+            "chatter_user_login": f"new-chatter-{i % 5}",
+            "message_text": f"new message {i}",
+            "timestamp": started_at + timedelta(hours=5, seconds=i),
+            "nlp_classification": "neutral",
+            "sentiment_score": 0.0,
+            "sentiment_magnitude": 0.0,
+            "sentiment_source": "google",
+            "message_id": f"new-{stream_id}-{i}",
+        }
+        for i in range(count)
+    ]
+
+
+def test_messages_post_lambda_bulk_insert(run_lambda, monkeypatch):
+    # Only the RDS writes are checked, the NLP client is not needed
+    monkeypatch.setenv("SENTIMENT_BACKEND", "lexicon")
+    monkeypatch.setenv("MESSAGES_WRITE_MODE", "bulk")
+    module, plans = run_lambda("twitchChatAnalytics-messages-post-lambda")
+    messages = new_messages(200)
+
+    assert len(module.insert_messages_to_postgresql_db(messages)) == len(messages)
+    # A redelivered batch goes through the conflict path and rolls nothing up
+    assert module.insert_messages_to_postgresql_db(messages) == set()
+
+    assert_no_seq_scan(plans)
+    assert {"messages_message_id_key", "stream_message_rollups_pkey"} <= conflict_arbiters(plans)
+
+
+def test_messages_add_to_rds(run_lambda):
+    module, plans = run_lambda("twitchChatAnalytics-messages-add-to-rds")
+    message = new_messages(1)[0]
+    message["timestamp"] = message["timestamp"].isoformat()
+
+    for inserted in (True, False):
+        response = module.lambda_handler({"body": json.dumps(message)}, None)
+        assert response["statusCode"] == 200, response
+        assert json.loads(response["body"])["inserted"] is inserted
+
+    assert_no_seq_scan(plans)
+    assert {"messages_message_id_key", "stream_message_rollups_pkey"} <= conflict_arbiters(plans)
+
+
+def test_post_stream_metadata(run_lambda):
+    module, plans = run_lambda("twitchChatAnalytics-post-stream-metadata")
+    started_at = STREAM_STARTS["stream-1"]
+    records = [
+        {
+            "messageId": str(i),
+            "body": json.dumps({
+                "stream_id": "stream-1",
+                "timestamp": (started_at + timedelta(minutes=5 * i)).isoformat(),
+                "viewer_count": 100,
+                "message_count": 40,
+            })
+        }
+        # Half of the snapshots are already stored and hit the conflict
+        for i in range(SNAPSHOTS_PER_STREAM // 2, SNAPSHOTS_PER_STREAM + SNAPSHOTS_PER_STREAM // 2)
+    ]
+
+    assert module.lambda_handler({"Records": records}, None) == {"batchItemFailures": []}
+    assert_no_seq_scan(plans)
+    assert conflict_arbiters(plans) == {"stream_metadata_stream_id_timestamp_key"}
+
+
+def test_patch_stream(run_lambda):
+    module, plans = run_lambda("twitchChatAnalytics-patch-stream")
+    body = {"stream_id": "stream-3", "ended_at": "2024-03-20T22:00:00Z", "end_follows": 10, "end_subs": 2}
+
+    response = module.lambda_handler({"body": json.dumps(body)}, None)
+
+    assert response["statusCode"] == 200, response
+    assert_no_seq_scan(plans)
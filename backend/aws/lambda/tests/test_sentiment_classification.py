@@ -0,0 +1,87 @@
+import math
+import random
+
+from hypothesis import given, strategies as st
+
+from sentiment_classification import SENTIMENT_RULES, classify_sentiment, classify_sentiment_batch
+
+SCORE_THRESHOLDS = sorted({score_below for score_below, _, _ in SENTIMENT_RULES})
+MAGNITUDE_THRESHOLDS = sorted({magnitude_above for _, magnitude_above, _ in SENTIMENT_RULES if magnitude_above is not None})
+
+
+def nudged(values):
+    """Every value, plus the closest floats on both sides of it"""
+    return [nudge for value in values for nudge in (math.nextafter(value, -math.inf), value, math.nextafter(value, math.inf))]
+
+
+def baseline_classify_sentiment(score, magnitude):
+    """Literal copy of classify_sentiment from messages-post-lambda before SENTIMENT_RULES, the reference of both implementations"""
+    rules = [
+        (score < -0.8, "Very Negative"),
+        (score < -0.6 and magnitude > 2, "Very Negative"),
+        (score < -0.4 and magnitude > 4, "Very Negative"),
+        (score < -0.6, "Negative"),
+        (score < -0.4 and magnitude > 2, "Negative"),
+        (score < -0.2 and magnitude > 4, "Negative"),
+        (score < -0.3, "Slightly Negative"),
+        (score < -0.1 and magnitude > 2, "Slightly Negative"),
+        (score < 0.1 and magnitude > 4, "Slightly Negative"),
+        (score < 0.3, "Neutral"),
+        (score < 0.5, "Slightly Positive"),
+        (score < 0.7, "Positive"),
+    ]
+
+    for condition, label in rules:
+        if condition:
+            return label
+    return "Very Positive"
+
+
+def baseline_label(score, magnitude):
+    # The baseline raised TypeError on None, the new implementations treat a missing value as NaN
+    return baseline_classify_sentiment(math.nan if score is None else score,
+                                       math.nan if magnitude is None else magnitude)
+
+
+def assert_same_labels(scores, magnitudes):
+    expected = [baseline_label(score, magnitude) for score, magnitude in zip(scores, magnitudes)]
+    scalar = [classify_sentiment(score, magnitude) for score, magnitude in zip(scores, magnitudes)]
+    batch = classify_sentiment_batch(scores, magnitudes).tolist()
+    mismatches = [
+        (score, magnitude, expected_label, scalar_label, batch_label)
+        for score, magnitude, expected_label, scalar_label, batch_label
+        in zip(scores, magnitudes, expected, scalar, batch)
+        if not expected_label == scalar_label == batch_label
+    ]
+    assert mismatches == []
+
+
+def test_values_on_every_threshold():
+    scores = nudged(SCORE_THRESHOLDS) + [None, math.nan, -math.inf, math.inf]
+    magnitudes = nudged(MAGNITUDE_THRESHOLDS) + [0.0, None, math.nan, math.inf]
+    pairs = [(score, magnitude) for score in scores for magnitude in magnitudes]
+
+    assert_same_labels([score for score, _ in pairs], [magnitude for _, magnitude in pairs])
+
+
+def test_seeded_random_pairs():
+    rng = random.Random(0)
+    scores = [rng.uniform(-1, 1) for _ in range(100_000)]
+    magnitudes = [rng.uniform(0, 8) for _ in range(100_000)]
+
+    assert_same_labels(scores, magnitudes)
+
+
+def test_missing_values_get_the_default_label_when_no_rule_can_match():
+    assert classify_sentiment(None, None) == classify_sentiment(math.nan, math.nan) == "Very Positive"
+    assert classify_sentiment_batch([None], [None]).tolist() == ["Very Positive"]
+
+
+scores = st.one_of(st.none(), st.floats(allow_nan=True, allow_infinity=True), st.sampled_from(nudged(SCORE_THRESHOLDS)))
+magnitudes = st.one_of(st.none(), st.floats(allow_nan=True, allow_infinity=True), st.sampled_from(nudged(MAGNITUDE_THRESHOLDS)))
+
+
+@given(st.lists(st.tuples(scores, magnitudes), min_size=1, max_size=50))
+def test_both_implementations_match_the_baseline_rules(pairs):
+    assert_same_labels([score for score, _ in pairs], [magnitude for _, magnitude in pairs])
+
@@ -1,6 +1,9 @@
 import boto3
 import json
+import os
+import time
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 
 API_ID = 'dh50useqij'
 STAGE = 'test'
@@ -11,14 +14,64 @@ apigateway_client = boto3.client('apigatewaymanagementapi',
                                  endpoint_url=f'https://{API_ID}.execute-api.{REGION}.amazonaws.com/{STAGE}')
 
 TABLE_NAME = "WebsocketConnections"
+INDEX_TABLE_NAME = "WebsocketConnectionIndex"
 MESSAGE_TYPE = 'nlp_processed_message'
+FANOUT_MAX_WORKERS = int(os.environ.get('FANOUT_MAX_WORKERS', 16))
+
+# Reused across warm invocations
+fanout_executor = ThreadPoolExecutor(max_workers=FANOUT_MAX_WORKERS)
+
+
+def post_to_connection(connection_id, payload):
+    """
+    Sends the already serialized payload to one connection.
+    Returns a (connection_id, latency_ms, status, error) tuple, status is 'sent', 'gone' or 'failed'.
+    """
+    started_at = time.perf_counter()
+    try:
+        clean_connection_id = urllib.parse.unquote(connection_id)
+        apigateway_client.post_to_connection(
+            ConnectionId=clean_connection_id,
+            Data=payload
+        )
+        status, error = 'sent', None
+    except apigateway_client.exceptions.GoneException as e:
+        status, error = 'gone', str(e)
+    except Exception as e:
+        status, error = 'failed', str(e)
+
+    latency_ms = (time.perf_counter() - started_at) * 1000
+    return connection_id, latency_ms, status, error
+
+
+def fan_out(connection_ids, payload):
+    """Sends payload to all connections concurrently, bounded by FANOUT_MAX_WORKERS"""
+    return list(fanout_executor.map(lambda connection_id: post_to_connection(connection_id, payload), connection_ids))
+
+
+def prune_gone_connections(broadcaster_user_login, gone_connection_ids):
+    """Removes connections that no longer exist from WebsocketConnections and the reverse index"""
+    try:
+        dynamodb.Table(TABLE_NAME).update_item(
+            Key={"streamer_name": broadcaster_user_login},
+            UpdateExpression="DELETE connection_ids :gone",
+            ExpressionAttributeValues={":gone": set(gone_connection_ids)}
+        )
+        with dynamodb.Table(INDEX_TABLE_NAME).batch_writer() as batch:
+            for connection_id in gone_connection_ids:
+                batch.delete_item(Key={"connection_id": connection_id})
+        print(f"Pruned gone connections: {gone_connection_ids}")
+    except Exception as e:
+        print(f"Error pruning gone connections {gone_connection_ids}: {e}")
+
 
 def lambda_handler(event, context):
     data = event
 
+    # Batched events carry all messages of one broadcaster and are delivered as one array frame
     response_data = {
         "type": MESSAGE_TYPE,
-        "data": event
+        "data": event["messages"] if "messages" in event else event
     }
 
     broadcaster_user_login = data.get("broadcaster_user_login")
@@ -37,23 +90,42 @@ def lambda_handler(event, context):
     if "Item" not in response:
         raise ValueError(f"No active connections found for broadcaster_user_login: {broadcaster_user_login}")
 
-    connection_ids = response["Item"].get("connection_ids", [])
+    # Stored as a string set, duplicates of older list items are dropped as well
+    connection_ids = set(response["Item"].get("connection_ids", []))
 
     if not connection_ids:
         raise ValueError(f"No connection_ids found for broadcaster_user_login: {broadcaster_user_login}")
 
-    errors = []
-    for connection_id in connection_ids:
-        try:
-            clean_connection_id = urllib.parse.unquote(connection_id)
-            apigateway_client.post_to_connection(
-                ConnectionId=clean_connection_id,
-                Data=json.dumps(response_data)
-            )
-            print(f"Message sent to connection_id: {connection_id}")
-        except Exception as e:
-            print(f"Error sending message to connection_id {connection_id}: {e}")
-            errors.append({"connection_id": connection_id, "error": str(e)})
+    # Serialized once for all connections
+    payload = json.dumps(response_data)
+    deliveries = fan_out(connection_ids, payload)
+
+    gone_connection_ids = [connection_id for connection_id, _, status, _ in deliveries if status == 'gone']
+    errors = [
+        {"connection_id": connection_id, "error": error}
+        for connection_id, _, status, error in deliveries
+        if status == 'failed'
+    ]
+    latencies = sorted(latency_ms for _, latency_ms, _, _ in deliveries)
+
+    for connection_id, latency_ms, status, error in deliveries:
+        print(f"Delivery to connection_id {connection_id}: {status} in {latency_ms:.1f} ms{f' - {error}' if error else ''}")
 
+    if gone_connection_ids:
+        prune_gone_connections(broadcaster_user_login, gone_connection_ids)
+
+    summary = {
+        "connections": len(deliveries),
+        "sent": len(deliveries) - len(gone_connection_ids) - len(errors),
+        "gone": len(gone_connection_ids),
+        "failed": len(errors),
+        "p50_latency_ms": round(latencies[len(latencies) // 2], 1),
+        "max_latency_ms": round(latencies[-1], 1)
+    }
+    print(f"Fan-out summary: {summary}")
+
+    # Failed deliveries are only reported, a retry of the whole invocation would resend to every connection
     if errors:
-        raise Exception(f"Errors occurred while sending messages: {errors}")
+        print(f"Errors occurred while sending messages: {errors}")
+
+    return summary
@@ -1,13 +1,25 @@
 import boto3
+import os
 import requests
 import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from botocore.exceptions import ClientError
 
 # Configuration
 USER_POOL_ID = 'eu-central-1_IzUkrEEsr'
 TABLE_NAME = 'UserRoles'
+TWITCH_API_URL = 'https://api.twitch.tv/helix'
+TWITCH_API_TIMEOUT_SECONDS = 5
+ROLES = {'Streamer', 'Moderator', 'Viewer'}
 cognito_client = boto3.client('cognito-idp')
-dynamodb = boto3.resource('dynamodb')
+# DYNAMODB_ENDPOINT_URL allows pointing the lambda at a local DynamoDB stand-in
+dynamodb = boto3.resource('dynamodb', endpoint_url=os.environ.get('DYNAMODB_ENDPOINT_URL'))
+
+# Pooled Twitch API session and worker pool, reused across warm invocations
+twitch_session = requests.Session()
+twitch_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=4))
+twitch_executor = ThreadPoolExecutor(max_workers=2)
 
 def handler(event, context):
     """
@@ -24,15 +36,16 @@ def handler(event, context):
         if not all([token, cognito_username, broadcaster_user_login, client_id]):
             return {'statusCode': 400, 'body': {'message': 'Missing required parameters'}}
 
-        # Verify OAuth token
-        twitch_data = verify_oauth_token(token, client_id)
+        # Verify OAuth token and get broadcaster data, the calls are independent so they run concurrently
+        twitch_data_future = twitch_executor.submit(verify_oauth_token, token, client_id)
+        broadcaster_data_future = twitch_executor.submit(get_broadcaster_data, token, broadcaster_user_login, client_id)
+        twitch_data = twitch_data_future.result()
+        broadcaster_data = broadcaster_data_future.result()
 
         if twitch_data is None:
             return {'statusCode': 400, 'body': {'message': 'Invalid OAuth token'}}
         user_id = twitch_data['id']
 
-        # Get broadcaster data
-        broadcaster_data = get_broadcaster_data(token, broadcaster_user_login, client_id)
         if not broadcaster_data:
             return {'statusCode': 404, 'body':{ 'message': 'Broadcaster not found' }}
 
@@ -60,62 +73,98 @@ def handler(event, context):
         print(f"Error in handler: {str(e)}")
         return {'statusCode': 500, 'body': { 'message': f'Internal server error: {str(e)}'}}
 
+def sync_handler(event, context):
+    """
+    Separate entry point (handler setting twitchChatAnalytics-authorization.sync_handler) that re-syncs
+    the roles of many users of one broadcaster, e.g. after a moderator list refresh.
+    It trusts its input, so it is invoked directly and never exposed through API Gateway.
+    """
+    broadcaster_user_login = event.get('broadcaster_user_login')
+    user_roles = event.get('user_roles')
+
+    if not broadcaster_user_login or not isinstance(user_roles, dict) or not user_roles:
+        return {'statusCode': 400, 'body': {'message': 'broadcaster_user_login and user_roles are required'}}
+
+    invalid_roles = sorted({role for role in user_roles.values() if role not in ROLES})
+    if invalid_roles:
+        return {'statusCode': 400, 'body': {'message': f'Unknown roles: {invalid_roles}'}}
+
+    if sync_user_roles(broadcaster_user_login, user_roles):
+        return {'statusCode': 200, 'body': {'message': f'Synced roles of {len(user_roles)} users'}}
+    return {'statusCode': 500, 'body': {'message': 'Failed to sync user roles'}}
+
 def add_user_info_to_db(cognito_username, broadcaster_login, role):
     """
-    Adds or updates user information to a DynamoDB table.
-    If the user does not exist, a new record is created.
+    Adds or updates user information to a DynamoDB table with a single conditional write.
+    If the user does not exist, a new record is created, an unchanged role is not rewritten.
     """
     try:
         table = dynamodb.Table(TABLE_NAME)
 
-        # Check if the user exists
-        response = table.get_item(
+        response = table.update_item(
             Key={
                 'CognitoUsername': cognito_username,
                 'BroadcasterUserLogin': broadcaster_login
-            }
+            },
+            UpdateExpression="SET UserRole = :role",
+            ConditionExpression="attribute_not_exists(UserRole) OR UserRole <> :role",
+            ExpressionAttributeValues={
+                ':role': role
+            },
+            ReturnValues="UPDATED_OLD"
         )
 
-        if 'Item' in response:
-            # User exists, update the role
-            table.update_item(
-                Key={
-                    'CognitoUsername': cognito_username,
-                    'BroadcasterUserLogin': broadcaster_login
-                },
-                UpdateExpression="SET UserRole = :role",
-                ExpressionAttributeValues={
-                    ':role': role
-                },
-                ReturnValues="UPDATED_NEW"
-            )
+        if 'Attributes' in response:
             print(f"Updated user {cognito_username} with role {role}")
         else:
-            # User does not exist, create a new record
-            table.put_item(
-                Item={
-                    'CognitoUsername': cognito_username,
-                    'BroadcasterUserLogin': broadcaster_login,
-                    'UserRole': role
-                }
-            )
             print(f"Added new user {cognito_username} with role {role}")
 
         return True
 
     except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            print(f"User {cognito_username} already has role {role}")
+            return True
         print(f"Error in add_user_info_to_db: {str(e)}")
         return False
 
 
+def sync_user_roles(broadcaster_login, user_roles):
+    """
+    Writes the roles of many users of one broadcaster, e.g. after a moderator list refresh.
+    user_roles maps cognito usernames to roles. Items are sent with BatchWriteItem
+    in chunks of 25, unprocessed items are retried by the batch writer.
+    """
+    try:
+        table = dynamodb.Table(TABLE_NAME)
+
+        with table.batch_writer(overwrite_by_pkeys=['CognitoUsername', 'BroadcasterUserLogin']) as batch:
+            for cognito_username, role in user_roles.items():
+                batch.put_item(
+                    Item={
+                        'CognitoUsername': cognito_username,
+                        'BroadcasterUserLogin': broadcaster_login,
+                        'UserRole': role
+                    }
+                )
+
+        print(f"Synced roles of {len(user_roles)} users for broadcaster {broadcaster_login}")
+        return True
+
+    except ClientError as e:
+        print(f"Error in sync_user_roles: {str(e)}")
+        return False
+
+
 def verify_oauth_token(token, client_id):
     """
     Verifies the OAuth token using Twitch's API.
     """
     try:
-        response = requests.get(
-            'https://api.twitch.tv/helix/users',
-            headers={'Authorization': f'Bearer {token}', 'Client-Id': client_id}
+        response = twitch_session.get(
+            f'{TWITCH_API_URL}/users',
+            headers={'Authorization': f'Bearer {token}', 'Client-Id': client_id},
+            timeout=TWITCH_API_TIMEOUT_SECONDS
         )
         if response.status_code != 200:
             print("OAuth token verification failed with status code:", response.status_code)
@@ -132,9 +181,11 @@ def get_broadcaster_data(token, broadcaster_user_login, client_id):
     Retrieves broadcaster data by login name using Twitch's API.
     """
     try:
-        response = requests.get(
-            f'https://api.twitch.tv/helix/users?login={broadcaster_user_login}',
-            headers={'Authorization': f'Bearer {token}', 'Client-Id': client_id}
+        response = twitch_session.get(
+            f'{TWITCH_API_URL}/users',
+            params={'login': broadcaster_user_login},
+            headers={'Authorization': f'Bearer {token}', 'Client-Id': client_id},
+            timeout=TWITCH_API_TIMEOUT_SECONDS
         )
         if response.status_code != 200:
             print("Broadcaster data retrieval failed with status code:", response.status_code)
@@ -149,18 +200,29 @@ def get_broadcaster_data(token, broadcaster_user_login, client_id):
 def verify_if_moderator(token, user_id, broadcaster_id, client_id):
     """
     Checks if the user is a moderator for a given broadcaster.
+    Follows Helix pagination until the broadcaster is found or all channels were checked.
     """
     try:
-        response = requests.get(
-            f'https://api.twitch.tv/helix/moderation/channels?user_id={user_id}',
-            headers={'Authorization': f'Bearer {token}', 'Client-Id': client_id}
-        )
-        if response.status_code == 200:
+        params = {'user_id': user_id, 'first': 100}
+        while True:
+            response = twitch_session.get(
+                f'{TWITCH_API_URL}/moderation/channels',
+                params=params,
+                headers={'Authorization': f'Bearer {token}', 'Client-Id': client_id},
+                timeout=TWITCH_API_TIMEOUT_SECONDS
+            )
+            if response.status_code != 200:
+                print(f"Moderator check failed with status code: {response.status_code}")
+                return False
+
             data = response.json()
-            return any(channel['broadcaster_id'] == broadcaster_id for channel in data['data'])
-        else:
-            print(f"Moderator check failed with status code: {response.status_code}")
-            return False
+            if any(channel['broadcaster_id'] == broadcaster_id for channel in data['data']):
+                return True
+
+            cursor = data.get('pagination', {}).get('cursor')
+            if not cursor:
+                return False
+            params['after'] = cursor
     except Exception as e:
         print(f"Error in verify_if_moderator: {str(e)}")
-        return False
\ No newline at end of file
+        return False
@@ -1,6 +1,12 @@
 import boto3
+import json
+import os
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
 import jwt
-from jwt import PyJWKClient
+from jwt import PyJWKSet
 
 # AWS Region and Cognito configurations
 REGION = "eu-central-1"
@@ -8,9 +14,34 @@ USER_POOL_ID = "eu-central-1_IzUkrEEsr"
 JWK_URL = f"https://cognito-idp.{REGION}.amazonaws.com/{USER_POOL_ID}/.well-known/jwks.json"
 TABLE_NAME = 'UserRoles'
 
+# JWKS cache configuration, JWKS_FILE points to a local jwks.json for offline runs
+JWKS_CACHE_TTL_SECONDS = int(os.environ.get('JWKS_CACHE_TTL', 3600))
+JWKS_MIN_REFRESH_INTERVAL_SECONDS = int(os.environ.get('JWKS_MIN_REFRESH_INTERVAL', 60))
+# Retry interval while no keys could be loaded yet, e.g. after a failed cold start fetch
+JWKS_EMPTY_RETRY_INTERVAL_SECONDS = int(os.environ.get('JWKS_EMPTY_RETRY_INTERVAL', 1))
+JWKS_FILE = os.environ.get('JWKS_FILE')
+
+# Role decision cache configuration, unknown users are cached for a shorter time
+ROLE_CACHE_TTL_SECONDS = int(os.environ.get('ROLE_CACHE_TTL', 60))
+ROLE_CACHE_NEGATIVE_TTL_SECONDS = int(os.environ.get('ROLE_CACHE_NEGATIVE_TTL', 10))
+ROLE_CACHE_MAX_SIZE = int(os.environ.get('ROLE_CACHE_MAX_SIZE', 1024))
+
 cognito_client = boto3.client('cognito-idp')
 dynamodb = boto3.resource('dynamodb')
 
+# Signing keys by kid, kept across warm invocations
+jwks_cache = {}
+jwks_fetched_at = None
+jwks_refresh_attempted_at = None
+jwks_lock = threading.Lock()
+
+# (cognito_username, broadcaster_user_login) -> (role, expires_at), least recently used first
+role_cache = OrderedDict()
+role_cache_metrics = {
+    "hits": 0,
+    "misses": 0
+}
+
 
 def lambda_handler(event, context):
     """
@@ -25,9 +56,8 @@ def lambda_handler(event, context):
         api_gateway_arn = get_api_gateway_arn(method_arn)
         print(event)
 
-        # Retrieve the signing key from JWK URL
-        jwk_client = PyJWKClient(JWK_URL)
-        signing_key = jwk_client.get_signing_key_from_jwt(token)
+        # Retrieve the signing key from the cached JWKS
+        signing_key = get_signing_key(token)
 
         # Decode the JWT token to get user details
         decoded_token = jwt.decode(
@@ -44,19 +74,22 @@ def lambda_handler(event, context):
         print("Decoded username:", username)
 
         # Check if the user is in the specified Cognito group
-        user_role = get_user_role_from_db(username, broadcaster_user_login)
+        user_role = get_cached_user_role(username, broadcaster_user_login)
+
+        # Policies cover the whole API and carry the role, so API Gateway can cache them per token and broadcaster
+        context = {"username": username, "role": user_role or "None"}
 
         # Check role and generate policy accordingly
         if user_role == "Streamer":
             # Streamers have access to all endpoints
-            return generate_policy("user", "Allow", api_gateway_arn)
+            return generate_policy(username, "Allow", api_gateway_arn, context)
         elif user_role == "Moderator":
             # Moderators have access only to GET methods
             api_gateway_arn = get_api_gateway_arn_for_moderator(method_arn)
-            return generate_policy("user", "Allow", api_gateway_arn)
+            return generate_policy(username, "Allow", api_gateway_arn, context)
         else:
             # Deny access for other roles
-            return generate_policy("user", "Deny", api_gateway_arn)
+            return generate_policy(username, "Deny", api_gateway_arn, context)
 
     except jwt.ExpiredSignatureError:
         print("Token has expired")
@@ -68,6 +101,57 @@ def lambda_handler(event, context):
         print(f"Error during authorization: {str(e)}")
         return generate_policy("user", "Deny", api_gateway_arn)
 
+def fetch_jwks():
+    """
+    Downloads the Cognito JWKS, or reads it from JWKS_FILE when it is set.
+    """
+    if JWKS_FILE:
+        with open(JWKS_FILE) as jwks_file:
+            return json.load(jwks_file)
+
+    with urllib.request.urlopen(JWK_URL, timeout=5) as response:
+        return json.load(response)
+
+def refresh_jwks_cache():
+    """
+    Reloads the signing keys. Refreshes are serialized and attempted at most once per
+    JWKS_MIN_REFRESH_INTERVAL_SECONDS, so a burst of tokens with an unknown kid
+    triggers a single download. On failure the previous keys are kept; while there are
+    no keys at all, the next attempt is allowed after JWKS_EMPTY_RETRY_INTERVAL_SECONDS.
+    """
+    global jwks_cache, jwks_fetched_at, jwks_refresh_attempted_at
+    with jwks_lock:
+        min_interval = JWKS_MIN_REFRESH_INTERVAL_SECONDS if jwks_cache else JWKS_EMPTY_RETRY_INTERVAL_SECONDS
+        if jwks_refresh_attempted_at is not None and time.monotonic() - jwks_refresh_attempted_at < min_interval:
+            return
+
+        jwks_refresh_attempted_at = time.monotonic()
+        try:
+            jwk_set = PyJWKSet.from_dict(fetch_jwks())
+            jwks_cache = {key.key_id: key for key in jwk_set.keys}
+            jwks_fetched_at = time.monotonic()
+            print(f"JWKS cache refreshed with kids: {list(jwks_cache)}")
+        except Exception as e:
+            print(f"Error refreshing JWKS cache: {str(e)}")
+
+def get_signing_key(token):
+    """
+    Returns the signing key for the token's kid from the JWKS cache.
+    The cache is refreshed when its TTL expired or when the kid is unknown (key rotation).
+    """
+    kid = jwt.get_unverified_header(token).get("kid")
+
+    if jwks_fetched_at is None or time.monotonic() - jwks_fetched_at >= JWKS_CACHE_TTL_SECONDS:
+        refresh_jwks_cache()
+
+    if kid not in jwks_cache:
+        refresh_jwks_cache()
+
+    if kid not in jwks_cache:
+        raise jwt.InvalidTokenError(f"Unknown signing key: {kid}")
+
+    return jwks_cache[kid]
+
 def get_api_gateway_arn(method_arn, resource_path="*"):
     """
     Extracts and constructs a generalized API Gateway ARN from the given methodArn.
@@ -88,9 +172,38 @@ def get_api_gateway_arn_for_moderator(method_arn, resource_path="GET/*"):
     api_gateway_arn = f"{arn_parts[0]}/{arn_parts[1]}/{resource_path}"
     return api_gateway_arn
 
+def get_cached_user_role(cognito_username, broadcaster_user_login):
+    """
+    Returns the user's role from the in-container LRU cache, falling back to DynamoDB.
+    Missing users are cached as well (negative caching) but with a shorter TTL.
+    """
+    key = (cognito_username, broadcaster_user_login)
+    now = time.monotonic()
+
+    entry = role_cache.get(key)
+    if entry is not None and entry[1] > now:
+        role_cache.move_to_end(key)
+        role_cache_metrics["hits"] += 1
+        print(f"Role cache hit for {key}, metrics: {role_cache_metrics}")
+        return entry[0]
+
+    role_cache_metrics["misses"] += 1
+    print(f"Role cache miss for {key}, metrics: {role_cache_metrics}")
+
+    role = get_user_role_from_db(cognito_username, broadcaster_user_login)
+
+    ttl = ROLE_CACHE_TTL_SECONDS if role else ROLE_CACHE_NEGATIVE_TTL_SECONDS
+    role_cache[key] = (role, now + ttl)
+    role_cache.move_to_end(key)
+    while len(role_cache) > ROLE_CACHE_MAX_SIZE:
+        role_cache.popitem(last=False)
+
+    return role
+
 def get_user_role_from_db(cognito_username, broadcaster_user_login):
     """
     Retrieves the user's role from DynamoDB.
+    Errors are raised instead of being reported as a missing user, so they are never cached.
     """
     try:
         table = dynamodb.Table(TABLE_NAME)
@@ -109,16 +222,17 @@ def get_user_role_from_db(cognito_username, broadcaster_user_login):
 
     except Exception as e:
         print(f"Error fetching user role from DB: {str(e)}")
-        return None
+        raise
 
 
-def generate_policy(principal_id, effect, resource):
+def generate_policy(principal_id, effect, resource, context=None):
     """
     Helper function to generate an IAM policy document.
+    The optional context is passed by API Gateway to the integration.
     """
     print(f"Generating policy with resource: {resource} and effect: {effect}")
     if effect and resource:
-        return {
+        policy = {
             "principalId": principal_id,
             "policyDocument": {
                 "Version": "2012-10-17",
@@ -131,5 +245,8 @@ def generate_policy(principal_id, effect, resource):
                 ]
             }
         }
+        if context:
+            policy["context"] = context
+        return policy
     else:
         raise ValueError("Effect and resource are required for policy generation")
\ No newline at end of file
@@ -1,36 +1,46 @@
 import json
-import psycopg2
+import base64
 from psycopg2 import sql
 import boto3
-import os
 from datetime import datetime
 from dateutil.parser import parse as parse_datetime
 from decimal import Decimal
 import urllib.parse
+from rds_connection import get_cursor
+from message_partitions import STREAM_START_BOUND
 
-user_name = os.environ['USER_NAME']
-password = os.environ['PASSWORD']
-rds_host = os.environ['RDS_HOST']
-rds_port = os.environ['RDS_PORT']
-rds_db_name = os.environ['RDS_DB_NAME']
+DEFAULT_PAGE_LIMIT = 500
+MAX_PAGE_LIMIT = 5000
+# Rows pulled from the server-side cursor per round trip
+CURSOR_ITERSIZE = 500
+
+
+def encode_cursor(timestamp, message_id):
+    """Builds an opaque pagination cursor pointing at the (timestamp, id) of the last returned row"""
+    payload = json.dumps({"timestamp": timestamp.isoformat(), "id": message_id})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor):
+    payload = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    return parse_datetime(payload["timestamp"]), int(payload["id"])
 
 
 def fetch_messages_from_postgresql_db(broadcaster_user_login,
                                       stream_id=None,
                                       chatter_user_login=None,
                                       start_time=None,
-                                      end_time=None):
-    conn = psycopg2.connect(
-        host=rds_host,
-        database=rds_db_name,
-        user=user_name,
-        password=password,
-        port=rds_port
-    )
-    cur = conn.cursor()
-
+                                      end_time=None,
+                                      limit=DEFAULT_PAGE_LIMIT,
+                                      after=None):
+    """
+    Returns one page of messages ordered by (timestamp, id) and the cursor of the next page,
+    which is None when there are no more matching rows.
+    Rows are streamed from a named server-side cursor in chunks of CURSOR_ITERSIZE.
+    """
     query = """
         SELECT
+            id,
             stream_id,
             broadcaster_user_login,
             chatter_user_login,
@@ -45,6 +55,9 @@ def fetch_messages_from_postgresql_db(broadcaster_user_login,
     if stream_id:
         query += " AND stream_id = %s"
         query_params.append(stream_id)
+        if not start_time:
+            query += f" AND timestamp >= ({STREAM_START_BOUND})"
+            query_params.append(stream_id)
 
     if chatter_user_login:
         query += " AND chatter_user_login = %s"
@@ -58,24 +71,37 @@ def fetch_messages_from_postgresql_db(broadcaster_user_login,
         query += " AND timestamp <= %s"
         query_params.append(end_time)
 
-    cur.execute(query, tuple(query_params))
-    rows = cur.fetchall()
-
-    result = [
-        {
-            "stream_id": row[0],
-            "broadcaster_user_login": row[1],
-            "chatter_user_login": row[2],
-            "message_text": row[3],
-            "nlp_classification": row[4],
-            "timestamp": row[5].isoformat() if row[5] else None
-        }
-        for row in rows
-    ]
+    if after:
+        query += " AND (timestamp, id) > (%s, %s)"
+        query_params.extend(after)
+
+    # One extra row tells whether there is a next page
+    query += " ORDER BY timestamp, id LIMIT %s"
+    query_params.append(limit + 1)
+
+    result = []
+    next_cursor = None
+    with get_cursor(name="fetch_messages_cursor") as cur:
+        cur.itersize = CURSOR_ITERSIZE
+        cur.execute(query, tuple(query_params))
 
-    cur.close()
-    conn.close()
-    return result
+        last_row = None
+        for row in cur:
+            if len(result) == limit:
+                next_cursor = encode_cursor(last_row[6], last_row[0])
+                break
+
+            result.append({
+                "stream_id": row[1],
+                "broadcaster_user_login": row[2],
+                "chatter_user_login": row[3],
+                "message_text": row[4],
+                "nlp_classification": row[5],
+                "timestamp": row[6].isoformat() if row[6] else None
+            })
+            last_row = row
+
+    return result, next_cursor
 
 
 def lambda_handler(event, context):
@@ -96,22 +122,47 @@ def lambda_handler(event, context):
         chatter_user_login = query_params.get('chatter_user_login', None)
         start_time = query_params.get('start_time', None)
         end_time = query_params.get('end_time', None)
+        limit = query_params.get('limit', None)
+        after = query_params.get('after', None)
 
         parsed_start_time = parse_datetime(start_time) if start_time else None
         parsed_end_time = parse_datetime(end_time) if end_time else None
         print(f"Parsed start_time: {parsed_start_time}")
 
-        messages = fetch_messages_from_postgresql_db(
+        try:
+            parsed_limit = int(limit) if limit else DEFAULT_PAGE_LIMIT
+            if not 0 < parsed_limit <= MAX_PAGE_LIMIT:
+                raise ValueError
+        except ValueError:
+            return {
+                "statusCode": 400,
+                "body": json.dumps({"error": f"limit must be an integer between 1 and {MAX_PAGE_LIMIT}"})
+            }
+
+        try:
+            parsed_after = decode_cursor(after) if after else None
+        except Exception:
+            return {
+                "statusCode": 400,
+                "body": json.dumps({"error": "Invalid after cursor"})
+            }
+
+        messages, next_cursor = fetch_messages_from_postgresql_db(
             broadcaster_user_login=broadcaster_user_login,
             stream_id=stream_id,
             chatter_user_login=chatter_user_login,
             start_time=parsed_start_time,
-            end_time=parsed_end_time
+            end_time=parsed_end_time,
+            limit=parsed_limit,
+            after=parsed_after
         )
 
         return {
             "statusCode": 200 if len(messages) > 0 else 204,
-            "body": json.dumps(messages)
+            "body": json.dumps({
+                "messages": messages,
+                "next_cursor": next_cursor
+            })
         }
     except Exception as e:
         print(f"Error occurred: {e}")
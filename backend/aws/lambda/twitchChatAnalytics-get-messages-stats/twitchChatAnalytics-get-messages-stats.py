@@ -0,0 +1,258 @@
+import json
+from dateutil.parser import parse as parse_datetime
+from rds_connection import get_cursor
+from message_partitions import STREAM_START_BOUND
+
+# SQL expressions truncating message timestamps to the start of their bucket
+BUCKET_EXPRESSIONS = {
+    "1m": "date_trunc('minute', timestamp)",
+    "5m": "date_trunc('hour', timestamp) + floor(date_part('minute', timestamp) / 5) * interval '5 minutes'",
+    "1h": "date_trunc('hour', timestamp)"
+}
+DEFAULT_BUCKET = "5m"
+DEFAULT_CHATTER_LIMIT = 50
+MAX_CHATTER_LIMIT = 1000
+
+
+def build_messages_filter(broadcaster_user_login,
+                          stream_id=None,
+                          chatter_user_login=None,
+                          start_time=None,
+                          end_time=None):
+    """Builds the WHERE conditions shared by all aggregations, same filters as get-messages-data"""
+    conditions = ["broadcaster_user_login = %s"]
+    query_params = [broadcaster_user_login]
+
+    if stream_id:
+        conditions.append("stream_id = %s")
+        query_params.append(stream_id)
+        if not start_time:
+            conditions.append(f"timestamp >= ({STREAM_START_BOUND})")
+            query_params.append(stream_id)
+
+    if chatter_user_login:
+        conditions.append("chatter_user_login = %s")
+        query_params.append(chatter_user_login)
+
+    if start_time:
+        conditions.append("timestamp >= %s")
+        query_params.append(start_time)
+
+    if end_time:
+        conditions.append("timestamp <= %s")
+        query_params.append(end_time)
+
+    return " AND ".join(conditions), query_params
+
+
+def fetch_messages_stats_from_postgresql_db(broadcaster_user_login,
+                                            stream_id=None,
+                                            chatter_user_login=None,
+                                            start_time=None,
+                                            end_time=None,
+                                            bucket=DEFAULT_BUCKET,
+                                            chatter_limit=DEFAULT_CHATTER_LIMIT):
+    """
+    Counts messages per nlp_classification, per chatter and per time bucket.
+    All aggregation is done in SQL, only the counts are returned.
+    """
+    conditions, query_params = build_messages_filter(broadcaster_user_login,
+                                                     stream_id,
+                                                     chatter_user_login,
+                                                     start_time,
+                                                     end_time)
+
+    classification_query = f"""
+        SELECT nlp_classification, COUNT(*)
+        FROM messages
+        WHERE {conditions}
+        GROUP BY nlp_classification
+    """
+
+    chatters_query = f"""
+        SELECT chatter_user_login, nlp_classification, COUNT(*)
+        FROM messages
+        WHERE chatter_user_login IN (
+            SELECT chatter_user_login
+            FROM messages
+            WHERE {conditions}
+            GROUP BY chatter_user_login
+            ORDER BY COUNT(*) DESC
+            LIMIT %s
+        )
+        AND {conditions}
+        GROUP BY chatter_user_login, nlp_classification
+    """
+
+    time_buckets_query = f"""
+        SELECT {BUCKET_EXPRESSIONS[bucket]} AS bucket, nlp_classification, COUNT(*)
+        FROM messages
+        WHERE {conditions}
+        GROUP BY 1, 2
+        ORDER BY 1
+    """
+
+    with get_cursor() as cur:
+        cur.execute(classification_query, tuple(query_params))
+        classification_rows = cur.fetchall()
+
+        cur.execute(chatters_query, tuple(query_params + [chatter_limit] + query_params))
+        chatter_rows = cur.fetchall()
+
+        cur.execute(time_buckets_query, tuple(query_params))
+        bucket_rows = cur.fetchall()
+
+    chatters = {}
+    for chatter, classification, count in chatter_rows:
+        entry = chatters.setdefault(chatter, {"chatter_user_login": chatter, "message_count": 0, "classifications": {}})
+        entry["message_count"] += count
+        entry["classifications"][classification] = count
+
+    time_buckets = {}
+    for bucket_start, classification, count in bucket_rows:
+        key = bucket_start.isoformat()
+        entry = time_buckets.setdefault(key, {"bucket": key, "message_count": 0, "classifications": {}})
+        entry["message_count"] += count
+        entry["classifications"][classification] = count
+
+    return {
+        "bucket": bucket,
+        "message_count": sum(count for _, count in classification_rows),
+        "classifications": {classification: count for classification, count in classification_rows},
+        "chatters": sorted(chatters.values(), key=lambda entry: entry["message_count"], reverse=True),
+        "time_buckets": list(time_buckets.values())
+    }
+
+
+def fetch_stream_summary_from_rollups(broadcaster_user_login, stream_id):
+    """
+    Reads the stream summary from the incrementally maintained rollup tables
+    instead of scanning messages. Buckets are always 5 minutes wide.
+    """
+    with get_cursor() as cur:
+        cur.execute("""
+            SELECT bucket, nlp_classification, message_count
+            FROM stream_message_rollups
+            WHERE stream_id = %s AND broadcaster_user_login = %s
+            ORDER BY bucket
+        """, (stream_id, broadcaster_user_login))
+        rollup_rows = cur.fetchall()
+
+        chatter_rows = []
+        unique_chatter_count = 0
+        if rollup_rows:
+            cur.execute("""
+                SELECT bucket, COUNT(*)
+                FROM stream_rollup_chatters
+                WHERE stream_id = %s
+                GROUP BY bucket
+            """, (stream_id,))
+            chatter_rows = cur.fetchall()
+
+            cur.execute("""
+                SELECT COUNT(DISTINCT chatter_user_login)
+                FROM stream_rollup_chatters
+                WHERE stream_id = %s
+            """, (stream_id,))
+            unique_chatter_count = cur.fetchone()[0]
+
+    chatters_per_bucket = {bucket_start: count for bucket_start, count in chatter_rows}
+
+    classifications = {}
+    time_buckets = {}
+    for bucket_start, classification, count in rollup_rows:
+        classifications[classification] = classifications.get(classification, 0) + count
+
+        key = bucket_start.isoformat()
+        entry = time_buckets.setdefault(key, {
+            "bucket": key,
+            "message_count": 0,
+            "unique_chatter_count": chatters_per_bucket.get(bucket_start, 0),
+            "classifications": {}
+        })
+        entry["message_count"] += count
+        entry["classifications"][classification] = count
+
+    return {
+        "bucket": "5m",
+        "message_count": sum(classifications.values()),
+        "unique_chatter_count": unique_chatter_count,
+        "classifications": classifications,
+        "time_buckets": list(time_buckets.values())
+    }
+
+
+def lambda_handler(event, context):
+    try:
+        print(event)
+
+        headers = event.get('headers') or {}
+        broadcaster_user_login = headers.get('BroadcasterUserLogin')
+
+        if not broadcaster_user_login:
+            return {
+                "statusCode": 400,
+                "body": json.dumps({"error": "BroadcasterUserLogin header is required"})
+            }
+
+        query_params = event.get('queryStringParameters') or {}
+        stream_id = query_params.get('stream_id', None)
+        chatter_user_login = query_params.get('chatter_user_login', None)
+        start_time = query_params.get('start_time', None)
+        end_time = query_params.get('end_time', None)
+        bucket = query_params.get('bucket', DEFAULT_BUCKET)
+        chatter_limit = query_params.get('chatter_limit', None)
+        summary = query_params.get('summary', 'false').lower() == 'true'
+
+        if summary:
+            if not stream_id:
+                return {
+                    "statusCode": 400,
+                    "body": json.dumps({"error": "stream_id parameter is required for summary"})
+                }
+
+            stats = fetch_stream_summary_from_rollups(broadcaster_user_login, stream_id)
+            return {
+                "statusCode": 200 if stats["message_count"] > 0 else 204,
+                "body": json.dumps(stats)
+            }
+
+        if bucket not in BUCKET_EXPRESSIONS:
+            return {
+                "statusCode": 400,
+                "body": json.dumps({"error": f"bucket must be one of: {', '.join(BUCKET_EXPRESSIONS)}"})
+            }
+
+        try:
+            parsed_chatter_limit = int(chatter_limit) if chatter_limit else DEFAULT_CHATTER_LIMIT
+            if not 0 < parsed_chatter_limit <= MAX_CHATTER_LIMIT:
+                raise ValueError
+        except ValueError:
+            return {
+                "statusCode": 400,
+                "body": json.dumps({"error": f"chatter_limit must be an integer between 1 and {MAX_CHATTER_LIMIT}"})
+            }
+
+        parsed_start_time = parse_datetime(start_time) if start_time else None
+        parsed_end_time = parse_datetime(end_time) if end_time else None
+
+        stats = fetch_messages_stats_from_postgresql_db(
+            broadcaster_user_login=broadcaster_user_login,
+            stream_id=stream_id,
+            chatter_user_login=chatter_user_login,
+            start_time=parsed_start_time,
+            end_time=parsed_end_time,
+            bucket=bucket,
+            chatter_limit=parsed_chatter_limit
+        )
+
+        return {
+            "statusCode": 200 if stats["message_count"] > 0 else 204,
+            "body": json.dumps(stats)
+        }
+    except Exception as e:
+        print(f"Error occurred: {e}")
+        return {
+            "statusCode": 500,
+            "body": json.dumps({"message": f"Error occurred: {e}"})
+        }
@@ -1,14 +1,14 @@
 import json
-import os
-import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2 import sql
 from datetime import datetime
+from dateutil.parser import parse as parse_datetime
+from rds_connection import get_cursor
+from stream_metadata import (
+    STREAM_METADATA_GAUGES, STREAM_METADATA_COUNTERS, SNAPSHOT_INTERVAL_SECONDS, parse_metadata_fields, parse_resolution
+)
 
-DB_HOST = os.environ['RDS_HOST']
-DB_PORT = os.environ.get('RDS_PORT')
-DB_NAME = os.environ['RDS_DB_NAME']
-DB_USER = os.environ['USER_NAME']
-DB_PASSWORD = os.environ['PASSWORD']
+# Upper bound of returned points, chart payloads stay the same size for streams of any length
+MAX_POINTS = 300
 
 def custom_serializer(obj):
     if isinstance(obj, datetime):
@@ -16,31 +16,75 @@ def custom_serializer(obj):
     raise TypeError(f"Type {type(obj)} not serializable")
 
 
-def query_stream_metadata(stream_id, broadcaster_username):
+def aggregate_expression(field):
+    """Downsampling aggregate of a stream_metadata column: average for gauges, sum for counters, last category"""
+    column = sql.Identifier("sn", field)
+    if field in STREAM_METADATA_GAUGES:
+        return sql.SQL("round(avg({column}))::integer").format(column=column)
+    if field in STREAM_METADATA_COUNTERS:
+        return sql.SQL("sum({column})::bigint").format(column=column)
+    return sql.SQL("(array_agg({column} ORDER BY sn.timestamp DESC))[1]").format(column=column)
+
+
+def query_stream_metadata(stream_id, broadcaster_username, fields, start_time=None, end_time=None,
+                          resolution=SNAPSHOT_INTERVAL_SECONDS):
+    """
+    Returns the snapshots of a stream downsampled into buckets of at least resolution seconds,
+    ordered by time. The bucket width grows with the covered time range so that at most MAX_POINTS
+    buckets are returned, whatever the length of the stream. Only the selected columns are read,
+    the time range uses the (stream_id, timestamp) index.
+    """
     try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD
-        )
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        query = sql.SQL("""
+        WITH snapshots AS (
+            SELECT sm.timestamp, {columns}
+            FROM stream_metadata sm
+            JOIN streams s ON sm.stream_id = s.stream_id
+            WHERE sm.stream_id = %s AND s.broadcaster_username = %s
+        """).format(columns=sql.SQL(", ").join(sql.Identifier("sm", field) for field in fields))
+        query_params = [stream_id, broadcaster_username]
 
-        query = """
-        SELECT sm.stream_id, sm.timestamp, sm.metadata
-        FROM stream_metadata sm
-        JOIN streams s ON sm.stream_id = s.stream_id
-        WHERE sm.stream_id = %s AND s.broadcaster_username = %s
-        """
+        if start_time:
+            query += sql.SQL(" AND sm.timestamp >= %s")
+            query_params.append(start_time)
 
-        cursor.execute(query, (stream_id, broadcaster_username,))
-        results = cursor.fetchall()
+        if end_time:
+            query += sql.SQL(" AND sm.timestamp <= %s")
+            query_params.append(end_time)
+
+        query += sql.SQL("""
+        ),
+        bucket_width AS (
+            SELECT GREATEST(%s, ceil(extract(epoch FROM max(timestamp) - min(timestamp)) / %s))::bigint AS seconds
+            FROM snapshots
+        )
+        SELECT
+            to_timestamp(floor(extract(epoch FROM sn.timestamp) / bw.seconds) * bw.seconds) AS bucket,
+            bw.seconds,
+            COUNT(*),
+            {aggregates}
+        FROM snapshots sn
+        CROSS JOIN bucket_width bw
+        GROUP BY 1, 2
+        ORDER BY 1
+        """).format(aggregates=sql.SQL(", ").join(aggregate_expression(field) for field in fields))
+        # Aligned buckets can straddle both ends of the range, one spare bucket keeps the total within MAX_POINTS
+        query_params.extend([resolution, MAX_POINTS - 1])
 
-        cursor.close()
-        conn.close()
+        with get_cursor() as cursor:
+            cursor.execute(query, tuple(query_params))
+            rows = cursor.fetchall()
 
-        return results
+        return [
+            {
+                "stream_id": stream_id,
+                "timestamp": row[0],
+                "resolution_seconds": row[1],
+                "sample_count": row[2],
+                "metadata": dict(zip(fields, row[3:]))
+            }
+            for row in rows
+        ]
 
     except Exception as e:
         print(f"Error querying the database: {e}")
@@ -48,7 +92,8 @@ def query_stream_metadata(stream_id, broadcaster_username):
 
 def lambda_handler(event, context):
     try:
-        stream_id = event.get('queryStringParameters', {}).get('stream_id')
+        query_params = event.get('queryStringParameters') or {}
+        stream_id = query_params.get('stream_id')
 
         if not stream_id:
             return {
@@ -65,7 +110,21 @@ def lambda_handler(event, context):
                 "body": json.dumps({"error": "BroadcasterUserLogin header is required"})
             }
 
-        data = query_stream_metadata(stream_id, broadcaster_username)
+        try:
+            fields = parse_metadata_fields(query_params.get('fields'))
+            # start_time/end_time are accepted like on the messages endpoints
+            start_time = query_params.get('from') or query_params.get('start_time')
+            end_time = query_params.get('to') or query_params.get('end_time')
+            parsed_start_time = parse_datetime(start_time) if start_time else None
+            parsed_end_time = parse_datetime(end_time) if end_time else None
+            resolution = parse_resolution(query_params.get('resolution'))
+        except (ValueError, OverflowError) as e:
+            return {
+                "statusCode": 400,
+                "body": json.dumps({"error": str(e)})
+            }
+
+        data = query_stream_metadata(stream_id, broadcaster_username, fields, parsed_start_time, parsed_end_time, resolution)
         response_body = json.dumps(data, default=custom_serializer)
         status = 200 if len(list(data)) > 0 else 204
 
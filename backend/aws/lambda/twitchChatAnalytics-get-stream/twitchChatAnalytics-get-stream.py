@@ -1,14 +1,7 @@
 import json
-import os
-import psycopg2
 from psycopg2.extras import RealDictCursor
 from datetime import datetime
-
-DB_HOST = os.environ['RDS_HOST']
-DB_PORT = os.environ.get('RDS_PORT')
-DB_NAME = os.environ['RDS_DB_NAME']
-DB_USER = os.environ['USER_NAME']
-DB_PASSWORD = os.environ['PASSWORD']
+from rds_connection import get_cursor
 
 def custom_serializer(obj):
     if isinstance(obj, datetime):
@@ -17,15 +10,6 @@ def custom_serializer(obj):
 
 def query_stream_metadata_by_stream_id(stream_id, broadcaster_username):
     try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD
-        )
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-
         query = """
         SELECT * 
         FROM streams
@@ -33,11 +17,9 @@ def query_stream_metadata_by_stream_id(stream_id, broadcaster_username):
         AND broadcaster_username = %s
         """
 
-        cursor.execute(query, (stream_id, broadcaster_username,))
-        results = cursor.fetchall()
-
-        cursor.close()
-        conn.close()
+        with get_cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(query, (stream_id, broadcaster_username,))
+            results = cursor.fetchall()
 
         return results
 
@@ -47,26 +29,15 @@ def query_stream_metadata_by_stream_id(stream_id, broadcaster_username):
 
 def query_streams_by_broadcaster_username(broadcaster_username):
     try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD
-        )
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-
         query = """
         SELECT * 
         FROM streams
         WHERE broadcaster_username = %s
         """
 
-        cursor.execute(query, (broadcaster_username,))
-        results = cursor.fetchall()
-
-        cursor.close()
-        conn.close()
+        with get_cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(query, (broadcaster_username,))
+            results = cursor.fetchall()
 
         return results
 
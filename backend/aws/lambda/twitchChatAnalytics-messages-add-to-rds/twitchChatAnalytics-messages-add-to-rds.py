@@ -1,78 +1,74 @@
 import boto3
 import json
 import urllib.parse
-import psycopg2
 from psycopg2 import sql
-import os
+from rds_connection import get_cursor
+from message_rollups import update_message_rollups
 
 def insert_data_to_postgresql_db(data):
-    user_name = os.environ['USER_NAME']
-    password = os.environ['PASSWORD']
-    rds_host = os.environ['RDS_HOST']
-    rds_port = os.environ['RDS_PORT']
-    rds_db_name = os.environ['RDS_DB_NAME']
-
+    """Inserts one classified message and rolls it up, returns False when it was already stored"""
     broadcaster_user_login = data.get("broadcaster_user_login")
     stream_id = data.get("stream_id")
     chatter_user_login = data.get("chatter_user_login")
     message_text = data.get("message_text")
     nlp_classification = data.get("nlp_classification")
+    sentiment_score = data.get("sentiment_score")
+    sentiment_magnitude = data.get("sentiment_magnitude")
+    sentiment_source = data.get("sentiment_source")
     timestamp = data.get("timestamp")
+    message_id = data.get("message_id")
 
-    # Init database connection
     try:
-        print("Establishing database connection...")
-        conn = psycopg2.connect(
-            host =      rds_host,
-            database =  rds_db_name,
-            user =      user_name,
-            password =  password,
-            port =      rds_port
-        )
-        print("Database connection established successfully.")
-    except Exception as e:
-        print(f"Error while connecting to database: {e}")
-        raise
+        with get_cursor() as cur:
 
-    try:
-        cur = conn.cursor()
+            # Prepare query
+            query = sql.SQL("""
+                    INSERT INTO messages (
+                        stream_id,
+                        broadcaster_user_login,
+                        chatter_user_login,
+                        message_text,
+                        timestamp,
+                        nlp_classification,
+                        sentiment_score,
+                        sentiment_magnitude,
+                        sentiment_source,
+                        message_id
+                    ) VALUES (
+                        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+                    )
+                    ON CONFLICT (message_id, timestamp) DO NOTHING
+                    RETURNING id
+                """)
+
+            # Execute query
+            print("Executing query to insert data into the database...")
+            cur.execute(query, (
+                stream_id,
+                broadcaster_user_login,
+                chatter_user_login,
+                message_text,
+                timestamp,
+                nlp_classification,
+                sentiment_score,
+                sentiment_magnitude,
+                sentiment_source,
+                message_id
+            ))
 
-        # Prepare query
-        query = sql.SQL("""
-                INSERT INTO messages (
-                    stream_id,
-                    broadcaster_user_login,
-                    chatter_user_login,
-                    message_text,
-                    timestamp,
-                    nlp_classification
-                ) VALUES (
-                    %s, %s, %s, %s, %s, %s
-                )
-            """)
+            # A retried message is already stored and must not be rolled up again
+            if cur.fetchone() is None:
+                print(f"Message {message_id} already stored, skipping.")
+                return False
 
-        # Execute query
-        print("Executing query to insert data into the database...")
-        cur.execute(query, (
-            stream_id,
-            broadcaster_user_login,
-            chatter_user_login,
-            message_text,
-            timestamp,
-            nlp_classification
-        ))
+            print("Updating stream message rollups...")
+            update_message_rollups(cur, [data])
 
-        conn.commit()
         print("Data inserted successfully.")
+        return True
     except Exception as e:
         print(f"Error while executing query or committing data: {e}")
-        conn.rollback()  # Rollback in case of error
         raise
-    finally:
-        # Close db connection
-        cur.close()
-        conn.close()
-        print("Database connection closed.")
 
 def lambda_handler(event, context):
     try:
@@ -80,12 +76,15 @@ def lambda_handler(event, context):
         print(f"Received event: {json.dumps(event)}")
         body = json.loads(event["body"])
         print("Starting data insertion into PostgreSQL DB...")
-        insert_data_to_postgresql_db(body)
-
+        inserted = insert_data_to_postgresql_db(body)
 
+        # inserted tells the caller whether this delivery was new or a retry of a stored message
         return {
             'statusCode': 200,
-            'body': json.dumps('Data inserted successfully')
+            'body': json.dumps({
+                'message': 'Data inserted successfully' if inserted else 'Data already stored',
+                'inserted': inserted
+            })
         }
 
     except Exception as e:
@@ -1,22 +1,74 @@
 import json
-from google.cloud import language_v1
-from google.oauth2 import service_account
 import boto3
 import os
 import requests
+from psycopg2.extras import execute_values
+from concurrent.futures import ThreadPoolExecutor
 from botocore.auth import SigV4Auth
 from botocore.awsrequest import AWSRequest
+from sentiment_classification import classify_sentiment
+from sentiment_cache import (
+    sentiment_cache_key, get_cached_sentiments, store_sentiments, sentiment_cache_metrics, cache_hit_ratios
+)
+from sentiment_lexicon import lexicon_sentiment, lexicon_document_sentiment, PRE_CLASSIFIER_SOURCE
+
+# 'google' calls the Google Cloud NLP API, 'lexicon' scores locally on the CPU (load tests, isolated environments)
+SENTIMENT_BACKEND = os.environ.get('SENTIMENT_BACKEND', 'google')
+
+if SENTIMENT_BACKEND == 'google':
+    from google.cloud import language_v1
+    from google.oauth2 import service_account
 
 CREDENTIALS_FILE = "credentials.json"
+NLP_MAX_WORKERS = int(os.environ.get('NLP_MAX_WORKERS', 8))
 
 lambda_client = boto3.client('lambda')
 lambda_send_back_name = 'twitchChatAnalytics-send-back-lambda'
+SEND_BACK_ENABLED = os.environ.get('SEND_BACK_ENABLED', 'true').lower() == 'true'
+# Upper bound of messages per send-back invocation, keeps websocket frames well below the size limit
+SEND_BACK_MAX_BATCH = int(os.environ.get('SEND_BACK_MAX_BATCH', 50))
 api_gateway_url = "https://t7pqmsv4x4.execute-api.eu-central-1.amazonaws.com/test/twitchChatAnalytics-messages-add-to-rds"
 
-def analyze(text, credentials_file):
+# 'bulk' writes the whole batch straight to RDS, 'api_gateway' posts every message to messages-add-to-rds
+rds_host = os.environ.get('RDS_HOST')
+MESSAGES_WRITE_MODE = os.environ.get('MESSAGES_WRITE_MODE', 'bulk' if rds_host else 'api_gateway')
+
+if MESSAGES_WRITE_MODE == 'bulk':
+    from rds_connection import get_cursor
+    from message_rollups import update_message_rollups
+
+# Local stage in front of the NLP API, 'none' sends every message to the API.
+# Off by default until PRE_CLASSIFIER_MIN_CONFIDENCE is validated against recorded API results.
+PRE_CLASSIFIERS = {
+    "none": None,
+    "lexicon": lexicon_sentiment
+}
+pre_classifier = PRE_CLASSIFIERS[os.environ.get('PRE_CLASSIFIER', 'none')]
+# Pre-classifier results below this confidence are forwarded to the NLP API
+PRE_CLASSIFIER_MIN_CONFIDENCE = float(os.environ.get('PRE_CLASSIFIER_MIN_CONFIDENCE', 0.9))
+
+pre_classifier_metrics = {
+    "local": 0,
+    "forwarded": 0
+}
+
+# Reused across warm invocations of the same container
+language_client = None
+nlp_executor = ThreadPoolExecutor(max_workers=NLP_MAX_WORKERS)
+
+
+def get_language_client(credentials_file=CREDENTIALS_FILE):
+    """Returns the container-wide LanguageServiceClient, creating it on first use"""
+    global language_client
+    if language_client is None:
+        credentials = service_account.Credentials.from_service_account_file(credentials_file)
+        language_client = language_v1.LanguageServiceClient(credentials=credentials)
+    return language_client
+
+
+def analyze(text, credentials_file=CREDENTIALS_FILE):
 
-    credentials = service_account.Credentials.from_service_account_file(credentials_file)
-    client = language_v1.LanguageServiceClient(credentials=credentials)
+    client = get_language_client(credentials_file)
 
     document = language_v1.Document(
         content=text, type_=language_v1.Document.Type.PLAIN_TEXT
@@ -27,6 +79,84 @@ def analyze(text, credentials_file):
     return annotations
 
 
+def google_sentiment(text):
+    document_sentiment = analyze(text).document_sentiment
+    return document_sentiment.score, document_sentiment.magnitude
+
+
+# Every backend maps a text to (score, magnitude) on the Google NLP scale
+SENTIMENT_BACKENDS = {
+    "google": google_sentiment,
+    "lexicon": lexicon_document_sentiment
+}
+sentiment_backend = SENTIMENT_BACKENDS[SENTIMENT_BACKEND]
+
+
+def pre_classify(text):
+    """Returns (score, magnitude) when the pre-classifier is confident, None when the NLP API has to decide"""
+    if pre_classifier is None:
+        return None
+    result = pre_classifier(text)
+    if result is None or result[2] < PRE_CLASSIFIER_MIN_CONFIDENCE:
+        return None
+    return result[0], result[1]
+
+
+def analyze_batch(texts):
+    """
+    Returns a list of ((score, magnitude), source, error) tuples in the same order as texts,
+    source is stored as sentiment_source. Trivial texts are scored by the local pre-classifier,
+    only the rest reach the sentiment cache and the sentiment backend.
+    """
+    results = [(pre_classify(text), PRE_CLASSIFIER_SOURCE, None) for text in texts]
+    remote_indexes = [i for i, (sentiment, _, _) in enumerate(results) if sentiment is None]
+    pre_classifier_metrics["local"] += len(texts) - len(remote_indexes)
+    pre_classifier_metrics["forwarded"] += len(remote_indexes)
+
+    remote_results = analyze_remote_batch([texts[i] for i in remote_indexes])
+    for i, (sentiment, error) in zip(remote_indexes, remote_results):
+        results[i] = (sentiment, SENTIMENT_BACKEND, error)
+    return results
+
+
+def analyze_remote_batch(texts):
+    """
+    Returns a list of ((score, magnitude), error) tuples in the same order as texts.
+    Sentiments are served from the sentiment cache where possible, every distinct normalized
+    text that is not cached is sent to the sentiment backend once, concurrently (bounded by NLP_MAX_WORKERS).
+    """
+    # Cache entries are kept apart per backend
+    keys = [sentiment_cache_key(text, SENTIMENT_BACKEND) for text in texts]
+    sentiments = get_cached_sentiments(keys)
+
+    # First text of every uncached key, repetitions reuse its result
+    pending = {}
+    for key, text in zip(keys, texts):
+        if key not in sentiments and key not in pending:
+            pending[key] = text
+
+    errors = {}
+    if pending:
+        try:
+            if SENTIMENT_BACKEND == 'google':
+                get_language_client()
+            futures = {key: nlp_executor.submit(sentiment_backend, text) for key, text in pending.items()}
+        except Exception as e:
+            futures = {}
+            errors = {key: e for key in pending}
+
+        analyzed = {}
+        for key, future in futures.items():
+            try:
+                analyzed[key] = future.result()
+            except Exception as e:
+                errors[key] = e
+        store_sentiments(analyzed)
+        sentiments.update(analyzed)
+
+    return [(sentiments.get(key), errors.get(key)) for key in keys]
+
+
 def sign_request(url, data, region="eu-central-1", method="POST"):
     """Sign an API Gateway request using AWS SigV4"""
     session = boto3.session.Session()
@@ -44,30 +174,146 @@ def sign_request(url, data, region="eu-central-1", method="POST"):
     return dict(request.headers)
 
 
-def classify_sentiment(score, magnitude):
-    rules = [
-        (score < -0.8, "Very Negative"),
-        (score < -0.6 and magnitude > 2, "Very Negative"),
-        (score < -0.4 and magnitude > 4, "Very Negative"),
-        (score < -0.6, "Negative"),
-        (score < -0.4 and magnitude > 2, "Negative"),
-        (score < -0.2 and magnitude > 4, "Negative"),
-        (score < -0.3, "Slightly Negative"),
-        (score < -0.1 and magnitude > 2, "Slightly Negative"),
-        (score < 0.1 and magnitude > 4, "Slightly Negative"),
-        (score < 0.3, "Neutral"),
-        (score < 0.5, "Slightly Positive"),
-        (score < 0.7, "Positive"),
-    ]
-
-    for condition, label in rules:
-        if condition:
-            return label
-    return "Very Positive"
+def insert_messages_to_postgresql_db(messages):
+    """
+    Inserts all classified messages of one SQS batch with a single multi-row INSERT
+    and updates the stream rollups, using one connection and one transaction.
+    Messages whose message_id is already stored are skipped, so redelivered records are not counted twice.
+    Returns the set of message_ids that were inserted by this call.
+    """
+    # SQS may deliver the same message twice, even within one batch
+    messages = list({message['message_id']: message for message in messages}.values())
+
+    with get_cursor() as cur:
+        inserted = execute_values(cur, """
+            INSERT INTO messages (
+                stream_id,
+                broadcaster_user_login,
+                chatter_user_login,
+                message_text,
+                timestamp,
+                nlp_classification,
+                sentiment_score,
+                sentiment_magnitude,
+                sentiment_source,
+                message_id
+            ) VALUES %s
+            ON CONFLICT (message_id, timestamp) DO NOTHING
+            RETURNING message_id
+        """, [
+            (
+                message['stream_id'],
+                message['broadcaster_user_login'],
+                message['chatter_user_login'],
+                message['message_text'],
+                message['timestamp'],
+                message['nlp_classification'],
+                message['sentiment_score'],
+                message['sentiment_magnitude'],
+                message['sentiment_source'],
+                message['message_id']
+            )
+            for message in messages
+        ], page_size=len(messages), fetch=True)
+
+        inserted_ids = {row[0] for row in inserted}
+        if len(inserted_ids) < len(messages):
+            print(f"Skipped {len(messages) - len(inserted_ids)} already stored messages")
+        update_message_rollups(cur, [message for message in messages if message['message_id'] in inserted_ids])
+
+    return inserted_ids
+
+
+def post_message_to_api_gateway(message):
+    """
+    Stores a single message through the messages-add-to-rds API Gateway route.
+    Returns a (stored, new, failure) tuple, new is False when the message was already stored
+    and failure holds the response details of a rejected request.
+    """
+    try:
+        print("Signing request and inserting data into RDS...")
+        signed_headers = sign_request(api_gateway_url, json.dumps(message))
+        response = requests.post(api_gateway_url, headers=signed_headers, json=message)
+
+        if response.status_code == 200:
+            new = response.json().get('inserted', True)
+            print("Successfully inserted data into RDS." if new else "Message was already stored.")
+            return True, new, None
+
+        print(f"Failed to insert data. Status code: {response.status_code}")
+        return False, False, {
+            'statusCode': response.status_code,
+            'body': f"Failed to insert data: {response.text}"
+        }
+
+    except Exception as e:
+        print(f"Failed inserting data to RDS - {str(e)}")
+        return False, False, None
+
+
+def store_messages(messages):
+    """
+    Stores classified messages in RDS, returns a (stored, new, failure) tuple per message.
+    new is False for a message that was already stored by an earlier delivery.
+    In bulk mode the whole batch is written at once, the API Gateway route is used
+    otherwise and as a fallback when the bulk insert fails.
+    """
+    if MESSAGES_WRITE_MODE == 'bulk' and messages:
+        try:
+            print(f"Bulk inserting {len(messages)} messages into RDS...")
+            inserted_ids = insert_messages_to_postgresql_db(messages)
+            print("Successfully inserted data into RDS.")
+            # Only the first of several copies within the batch is new
+            results = []
+            for message in messages:
+                new = message['message_id'] in inserted_ids
+                inserted_ids.discard(message['message_id'])
+                results.append((True, new, None))
+            return results
+        except Exception as e:
+            print(f"Bulk insert failed, falling back to API Gateway - {str(e)}")
+
+    return [post_message_to_api_gateway(message) for message in messages]
+
+
+def send_back_messages(messages):
+    """
+    Invokes send-back-lambda once per broadcaster (and per SEND_BACK_MAX_BATCH messages)
+    so all results of one broadcaster are delivered in a single websocket frame.
+    """
+    if not SEND_BACK_ENABLED:
+        return
+
+    messages_by_broadcaster = {}
+    for message in messages:
+        messages_by_broadcaster.setdefault(message['broadcaster_user_login'], []).append(message)
+
+    for broadcaster_user_login, broadcaster_messages in messages_by_broadcaster.items():
+        for start in range(0, len(broadcaster_messages), SEND_BACK_MAX_BATCH):
+            batch = broadcaster_messages[start:start + SEND_BACK_MAX_BATCH]
+            try:
+                print(f"Starting {lambda_send_back_name} for {broadcaster_user_login} with {len(batch)} messages")
+                lambda_client.invoke(
+                    FunctionName=lambda_send_back_name,
+                    InvocationType="Event",
+                    Payload=json.dumps({
+                        "broadcaster_user_login": broadcaster_user_login,
+                        "messages": batch
+                    })
+                )
+            except Exception as e:
+                print(f"Failed starting: {lambda_send_back_name} - {str(e)}")
 
 
 def lambda_handler(event, context):
+    """
+    Classifies and stores a batch of chat messages from SQS.
+    Records that could not be parsed, classified or stored are returned in batchItemFailures,
+    so only those are redelivered (requires ReportBatchItemFailures on the event source mapping).
+    """
     results = []
+    parsed_messages = []
+    batch_item_failures = []
 
     for i, record in enumerate(event['Records']):
 
@@ -76,78 +322,103 @@ def lambda_handler(event, context):
             message_data = json.loads(message)
             print("Processing message:", i, message_data)
 
-            stream_id = message_data['stream_id']
-            broadcaster_user_login = message_data['broadcaster_user_login']
-            chatter_user_login = message_data['chatter_user_login']
-            chatter_user_id = message_data['chatter_user_id']
-            chatter_user_name = message_data['chatter_user_name']
-            message_text = message_data['message_text']
-            timestamp = message_data['timestamp']
-            message_id = message_data['message_id']
+            parsed_messages.append({
+                "stream_id": message_data['stream_id'],
+                "broadcaster_user_login": message_data['broadcaster_user_login'],
+                "chatter_user_login": message_data['chatter_user_login'],
+                "chatter_user_id": message_data['chatter_user_id'],
+                "chatter_user_name": message_data['chatter_user_name'],
+                "message_text": message_data['message_text'],
+                "timestamp": message_data['timestamp'],
+                "message_id": message_data['message_id'],
+                "record_id": record['messageId']
+            })
 
         except Exception as e:
             print(f"Failed reading json: {str(e)}")
+            # Reported as well, after maxReceiveCount the record ends up in the dead-letter queue
+            batch_item_failures.append({"itemIdentifier": record['messageId']})
             continue
 
+    print(f"Sentiment Analysis of {len(parsed_messages)} messages")
+    metrics_before = dict(sentiment_cache_metrics)
+    pre_classifier_before = dict(pre_classifier_metrics)
+    sentiments = analyze_batch([message['message_text'] for message in parsed_messages])
+    invocation_metrics = {
+        name: count - metrics_before[name] for name, count in sentiment_cache_metrics.items()
+    }
+    invocation_pre_classifier = {
+        name: count - pre_classifier_before[name] for name, count in pre_classifier_metrics.items()
+    }
+    print(f"Pre-classifier: {invocation_pre_classifier}, container totals: {pre_classifier_metrics}")
+    print(f"Sentiment cache: {invocation_metrics}, container totals: {sentiment_cache_metrics}")
+
+    classified = []
+
+    for i, (message, (sentiment, source, error)) in enumerate(zip(parsed_messages, sentiments)):
+
+        if error is not None:
+            print(f"Error with NLP API {str(error)}", i)
+            batch_item_failures.append({"itemIdentifier": message['record_id']})
+            continue
 
         try:
-            print(f"Sentiment Analysis: {message_text}", i)
-            annotations = analyze(message_text, CREDENTIALS_FILE)
-            sentiment_score = annotations.document_sentiment.score
-            magnitude_score = annotations.document_sentiment.magnitude
+            sentiment_score, magnitude_score = sentiment
             nlp_classification = classify_sentiment(sentiment_score, magnitude_score)
 
         except Exception as e:
             print(f"Error with NLP API {str(e)}")
+            batch_item_failures.append({"itemIdentifier": message['record_id']})
             continue
 
 
         result = {
-            "stream_id": stream_id,
-            "broadcaster_user_login": broadcaster_user_login,
-            "chatter_user_login": chatter_user_login,
-            "message_text": message_text,
-            "timestamp": timestamp,
-            "nlp_classification": nlp_classification
+            "stream_id": message['stream_id'],
+            "broadcaster_user_login": message['broadcaster_user_login'],
+            "chatter_user_login": message['chatter_user_login'],
+            "message_text": message['message_text'],
+            "timestamp": message['timestamp'],
+            "message_id": message['message_id'],
+            "nlp_classification": nlp_classification,
+            "sentiment_score": sentiment_score,
+            "sentiment_magnitude": magnitude_score,
+            "sentiment_source": source
         }
+        classified.append((message, result))
 
-        try:
-            print("Signing request and inserting data into RDS...")
-            signed_headers = sign_request(api_gateway_url, json.dumps(result))
-            response = requests.post(api_gateway_url, headers=signed_headers, json=result)
-
-            if response.status_code == 200:
-                print("Successfully inserted data into RDS.")
-            else:
-                print(f"Failed to insert data. Status code: {response.status_code}")
-                results.append({
-                    'statusCode': response.status_code,
-                    'body': f"Failed to insert data: {response.text}"
-                })
-                continue
+    store_results = store_messages([result for _, result in classified])
+    new_results = []
 
-        except Exception as e:
-            print(f"Failed inserting data to RDS - {str(e)}")
+    for (message, result), (stored, new, failure) in zip(classified, store_results):
+
+        if not stored:
+            if failure:
+                results.append(failure)
+            batch_item_failures.append({"itemIdentifier": message['record_id']})
             continue
 
-        try:
-            result['message_id'] = message_id
-            result['chatter_user_name'] = chatter_user_name
-            result['chatter_user_id'] = chatter_user_id
-
-            print(f"Starting {lambda_send_back_name}")
-            response = lambda_client.invoke(
-                FunctionName=lambda_send_back_name,
-                InvocationType="Event",
-                Payload=json.dumps(result)
-            )
+        result['chatter_user_name'] = message['chatter_user_name']
+        result['chatter_user_id'] = message['chatter_user_id']
+        results.append(result)
+        # A redelivered message was already sent back, the bot would count its sentiment twice
+        if new:
+            new_results.append(result)
 
-        except Exception as e:
-            print(f"Failed starting: {lambda_send_back_name} - {str(e)}")
+    send_back_messages(new_results)
 
-        results.append(result)
+    if batch_item_failures:
+        print(f"{len(batch_item_failures)} of {len(event['Records'])} records failed and will be redelivered")
 
     return {
+        "batchItemFailures": batch_item_failures,
         "statusCode": 200,
-        "body": json.dumps(results)
+        "body": json.dumps({
+            "messages": results,
+            "pre_classifier": invocation_pre_classifier,
+            "sentiment_cache": {
+                **invocation_metrics,
+                **cache_hit_ratios(invocation_metrics),
+                "container": {**sentiment_cache_metrics, **cache_hit_ratios()}
+            }
+        })
     }
@@ -0,0 +1,139 @@
+import json
+import os
+import re
+from datetime import date
+from rds_connection import get_cursor
+
+# Months of messages kept, older monthly partitions are dropped as a whole
+RETENTION_MONTHS = int(os.environ.get('MESSAGES_RETENTION_MONTHS', 6))
+# Partitions created ahead of time, so new messages never land in messages_default
+PARTITIONS_AHEAD_MONTHS = int(os.environ.get('MESSAGES_PARTITIONS_AHEAD_MONTHS', 2))
+# Creating and detaching partitions lock messages, give up instead of blocking inserts behind it
+LOCK_TIMEOUT = os.environ.get('MESSAGES_RETENTION_LOCK_TIMEOUT', '5s')
+
+PARTITION_NAME = re.compile(r"^messages_p(\d{4})(\d{2})$")
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def create_upcoming_partitions(today):
+    """
+    Creates the monthly partitions of the current month and PARTITIONS_AHEAD_MONTHS after it,
+    and of the kept months whose rows landed in messages_default, which moves those rows out of it.
+    """
+    current_month = today.replace(day=1)
+    oldest_kept_month = add_months(current_month, -RETENTION_MONTHS)
+    with get_cursor() as cur:
+        cur.execute("SELECT set_config('lock_timeout', %s, true)", (LOCK_TIMEOUT,))
+        cur.execute(
+            "SELECT min(timestamp)::date FROM messages_default WHERE timestamp >= %s",
+            (oldest_kept_month,)
+        )
+        earliest_default = cur.fetchone()[0]
+        from_month = min(current_month, earliest_default) if earliest_default else current_month
+        cur.execute(
+            "SELECT create_messages_partitions(%s, %s)",
+            (from_month, add_months(current_month, PARTITIONS_AHEAD_MONTHS))
+        )
+        return cur.fetchone()[0]
+
+
+def delete_expired_default_rows(today):
+    """
+    Deletes the rows of messages_default older than the retention window, they have no partition to drop.
+    messages_default only holds the few rows that arrived before their month was created.
+    """
+    oldest_kept_month = add_months(today.replace(day=1), -RETENTION_MONTHS)
+    with get_cursor() as cur:
+        cur.execute("SELECT set_config('lock_timeout', %s, true)", (LOCK_TIMEOUT,))
+        cur.execute("DELETE FROM messages_default WHERE timestamp < %s", (oldest_kept_month,))
+        return cur.rowcount
+
+
+def list_expired_partitions(today):
+    """Returns the monthly partitions that end before the retention window, oldest first"""
+    oldest_kept_month = add_months(today.replace(day=1), -RETENTION_MONTHS)
+    with get_cursor() as cur:
+        cur.execute("""
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON pg_inherits.inhparent = parent.oid
+            JOIN pg_class child ON pg_inherits.inhrelid = child.oid
+            WHERE parent.relname = 'messages'
+        """)
+        names = [row[0] for row in cur.fetchall()]
+
+    expired = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match and date(int(match.group(1)), int(match.group(2)), 1) < oldest_kept_month:
+            expired.append(name)
+    return sorted(expired)
+
+
+def drop_partition(name):
+    """Detaches and drops one partition in its own short transaction, no row is deleted one by one"""
+    with get_cursor() as cur:
+        cur.execute("SELECT set_config('lock_timeout', %s, true)", (LOCK_TIMEOUT,))
+        # name comes from pg_class and matched PARTITION_NAME, it is a safe identifier
+        cur.execute(f"ALTER TABLE messages DETACH PARTITION {name}")
+        cur.execute(f"DROP TABLE {name}")
+
+
+def lambda_handler(event, context):
+    """
+    Scheduled maintenance of the partitioned messages table:
+    creates upcoming monthly partitions and drops the ones older than the retention window.
+    """
+    today = date.today()
+    created = 0
+    default_rows_deleted = 0
+    dropped = []
+    failed = []
+
+    # The steps run independently, a failed one does not keep the others from cleaning up
+    try:
+        created = create_upcoming_partitions(today)
+        print(f"Created {created} partitions")
+    except Exception as e:
+        print(f"Failed creating partitions: {e}")
+        failed.append("create_messages_partitions")
+
+    try:
+        default_rows_deleted = delete_expired_default_rows(today)
+        print(f"Deleted {default_rows_deleted} expired rows of messages_default")
+    except Exception as e:
+        print(f"Failed deleting expired rows of messages_default: {e}")
+        failed.append("messages_default")
+
+    try:
+        expired = list_expired_partitions(today)
+    except Exception as e:
+        print(f"Error: {e}")
+        return {
+            "statusCode": 500,
+            "body": json.dumps({"error": str(e), "created": created, "failed": failed})
+        }
+
+    for name in expired:
+        try:
+            drop_partition(name)
+            dropped.append(name)
+            print(f"Dropped partition {name}")
+        except Exception as e:
+            # Usually a lock timeout, the next scheduled run retries
+            print(f"Failed dropping partition {name}: {e}")
+            failed.append(name)
+
+    return {
+        "statusCode": 200 if not failed else 500,
+        "body": json.dumps({
+            "created": created,
+            "default_rows_deleted": default_rows_deleted,
+            "dropped": dropped,
+            "failed": failed
+        })
+    }
@@ -1,27 +1,11 @@
 import json
-import psycopg2
 from psycopg2 import sql
 from dateutil.parser import parse as parse_datetime
-import os
 from urllib.parse import unquote
+from rds_connection import get_cursor
 
 
-user_name = os.environ['USER_NAME']
-password = os.environ['PASSWORD']
-rds_host = os.environ['RDS_HOST']
-rds_port = os.environ['RDS_PORT']
-rds_db_name = os.environ['RDS_DB_NAME']
-
 def update_data_in_postgresql_db(stream_id, updates):
-    conn = psycopg2.connect(
-        host=rds_host,
-        database=rds_db_name,
-        user=user_name,
-        password=password,
-        port=rds_port
-    )
-    cur = conn.cursor()
-
     set_clauses = []
     values = []
     for column, value in updates.items():
@@ -36,10 +20,8 @@ def update_data_in_postgresql_db(stream_id, updates):
         WHERE stream_id = %s
     """
 
-    cur.execute(query, values)
-    conn.commit()
-    cur.close()
-    conn.close()
+    with get_cursor() as cur:
+        cur.execute(query, values)
 
 def lambda_handler(event, context):
     try:
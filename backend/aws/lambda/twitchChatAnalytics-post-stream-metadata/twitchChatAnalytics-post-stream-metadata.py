@@ -1,97 +1,112 @@
 import json
-import psycopg2
-from psycopg2 import sql
+from psycopg2.extras import execute_values
 import boto3
-import os
 from datetime import datetime
 from dateutil.parser import parse as parse_datetime
 from urllib.parse import unquote
+from rds_connection import get_cursor
+from stream_metadata import STREAM_METADATA_FIELDS, STREAM_METADATA_GAUGES, STREAM_METADATA_COUNTERS
 
-user_name = os.environ['USER_NAME']
-password = os.environ['PASSWORD']
-rds_host = os.environ['RDS_HOST']
-rds_port = os.environ['RDS_PORT']
-rds_db_name = os.environ['RDS_DB_NAME']
+INSERT_COLUMNS = ", ".join(["stream_id", "timestamp"] + STREAM_METADATA_FIELDS)
+# Counters and gauges are INTEGER columns
+MAX_COUNT = 2**31 - 1
 
-def insert_data_to_postgresql_db(stream_id, timestamp, metadata):
-    conn = psycopg2.connect(
-        host=rds_host,
-        database=rds_db_name,
-        user=user_name,
-        password=password,
-        port=rds_port
-    )
-    cur = conn.cursor()
-    query = sql.SQL("""
-        INSERT INTO stream_metadata (
-            stream_id,
-            timestamp,
-            metadata
-        ) VALUES (
-            %s, %s, %s
-        )
-    """)
+def insert_snapshots_to_postgresql_db(snapshots):
+    """
+    Writes all snapshots of a batch, rows of INSERT_COLUMNS, with one multi-row INSERT
+    in one transaction. One snapshot per stream and timestamp, redelivered records are a no-op.
+    """
+    with get_cursor() as cur:
+        execute_values(cur, f"""
+            INSERT INTO stream_metadata ({INSERT_COLUMNS}) VALUES %s
+            ON CONFLICT (stream_id, timestamp) DO NOTHING
+        """, snapshots, page_size=len(snapshots))
 
-    cur.execute(query, (
-        stream_id,
-        timestamp,
-        metadata
-    ))
 
-    conn.commit()
-    cur.close()
-    conn.close()
-
-def lambda_handler(event, context):
-    for i, record in enumerate(event['Records']):
+def insert_snapshots_one_by_one(snapshots, record_ids):
+    """
+    Fallback when the batch INSERT failed: writes every snapshot in its own transaction.
+    Returns the record ids of the snapshots that still failed.
+    """
+    failed_record_ids = []
+    for snapshot, record_id in zip(snapshots, record_ids):
         try:
-            raw_message = record['body']
-            decoded_message = unquote(raw_message)
-            message_data = json.loads(decoded_message)
-            stream_id = message_data['stream_id']
-            raw_timestamp = message_data['timestamp']
-            try:
-                parsed_timestamp = parse_datetime(raw_timestamp)
-                print(parsed_timestamp, raw_timestamp)
-            except ValueError as e:
-                print(f"Failed to parse timestamp: {raw_timestamp} | Error: {e}")
-                continue
+            insert_snapshots_to_postgresql_db([snapshot])
+        except Exception as e:
+            print(f"Error when inserting snapshot of record {record_id}: {e}")
+            failed_record_ids.append(record_id)
+    return failed_record_ids
+
+
+def parse_count(message_data, field):
+    """
+    Returns a counter or gauge of a snapshot as int, 0 when missing and None when null.
+    Raises ValueError on anything that does not fit the INTEGER column.
+    """
+    value = message_data.get(field, 0)
+    if value is None:
+        return None
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    elif isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value <= MAX_COUNT:
+        raise ValueError(f"Invalid {field}: {message_data.get(field)!r}")
+    return value
 
-            metadata = {
-                "category": message_data.get('category', "unknown"),
-                "viewer_count": message_data.get('viewer_count', 0),
-                "follower_count": message_data.get('follower_count', 0),
-                "subscriber_count": message_data.get('subscriber_count', 0),
-                "message_count": message_data.get('message_count', 0),
-                "very_negative_message_count": message_data.get('very_negative_message_count', 0),
-                "negative_message_count": message_data.get('negative_message_count', 0),
-                "slightly_negative_message_count": message_data.get('slightly_negative_message_count', 0),
-                "neutral_message_count": message_data.get('neutral_message_count', 0),
-                "slightly_positive_message_count": message_data.get('slightly_positive_message_count', 0),
-                "positive_message_count": message_data.get('positive_message_count', 0),
-                "very_positive_message_count": message_data.get('very_positive_message_count', 0),
 
+def parse_snapshot(record):
+    """Returns the stream_metadata row (INSERT_COLUMNS) of an SQS record, raises on invalid records"""
+    raw_message = record['body']
+    decoded_message = unquote(raw_message)
+    message_data = json.loads(decoded_message)
+    stream_id = message_data['stream_id']
+    raw_timestamp = message_data['timestamp']
+    try:
+        parsed_timestamp = parse_datetime(raw_timestamp)
+    except ValueError as e:
+        raise ValueError(f"Failed to parse timestamp: {raw_timestamp} | Error: {e}")
 
-            }
+    metadata = {"category": message_data.get('category', "unknown")}
+    for field in STREAM_METADATA_GAUGES + STREAM_METADATA_COUNTERS:
+        metadata[field] = parse_count(message_data, field)
 
-            metadata_json = json.dumps(metadata)
-            print(f"stream_id: {stream_id} | Metadata JSON: {metadata_json}")
+    print(f"stream_id: {stream_id} | Metadata: {metadata}")
+    return (stream_id, parsed_timestamp, *(metadata[field] for field in STREAM_METADATA_FIELDS))
 
+
+def lambda_handler(event, context):
+    """
+    Stores the stream metadata snapshots of an SQS batch with a single INSERT.
+    Failed records are returned in batchItemFailures so only those are redelivered.
+    """
+    batch_item_failures = []
+    snapshots = []
+    snapshot_record_ids = []
+
+    for i, record in enumerate(event['Records']):
+        try:
+            snapshots.append(parse_snapshot(record))
+            snapshot_record_ids.append(record['messageId'])
         except KeyError as e:
             print(f"Missing required field: {e}")
-            continue
+            batch_item_failures.append({"itemIdentifier": record['messageId']})
         except json.JSONDecodeError as e:
             print(f"Failed decoding JSON: {e}")
-            continue
+            batch_item_failures.append({"itemIdentifier": record['messageId']})
         except Exception as e:
             print(f"Failed processing message: {e}")
-            continue
+            batch_item_failures.append({"itemIdentifier": record['messageId']})
 
+    if snapshots:
         try:
-            print("Connecting to database")
-            insert_data_to_postgresql_db(stream_id, parsed_timestamp, metadata_json)
+            print(f"Inserting {len(snapshots)} snapshots")
+            insert_snapshots_to_postgresql_db(snapshots)
             print("Data inserted successfully")
         except Exception as e:
-            print(f"Error when connecting to database: {e}")
+            # One bad row fails the whole INSERT, retry row by row so only the failing records are redelivered
+            print(f"Error when inserting into database: {e}, inserting one by one")
+            failed_record_ids = insert_snapshots_one_by_one(snapshots, snapshot_record_ids)
+            batch_item_failures.extend({"itemIdentifier": record_id} for record_id in failed_record_ids)
 
-    return
+    return {"batchItemFailures": batch_item_failures}
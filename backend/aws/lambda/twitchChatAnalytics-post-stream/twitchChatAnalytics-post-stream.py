@@ -1,17 +1,10 @@
 import json
-import psycopg2
 from psycopg2 import sql
 import boto3
-import os
 from datetime import datetime
 from dateutil.parser import parse as parse_datetime
 from urllib.parse import unquote
-
-user_name = os.environ['USER_NAME']
-password = os.environ['PASSWORD']
-rds_host = os.environ['RDS_HOST']
-rds_port = os.environ['RDS_PORT']
-rds_db_name = os.environ['RDS_DB_NAME']
+from rds_connection import get_cursor
 
 def insert_data_to_postgresql_db(stream_id,
                                  broadcaster_username,
@@ -22,14 +15,6 @@ def insert_data_to_postgresql_db(stream_id,
                                  end_follows,
                                  start_subs,
                                  end_subs):
-    conn = psycopg2.connect(
-        host=rds_host,
-        database=rds_db_name,
-        user=user_name,
-        password=password,
-        port=rds_port
-    )
-    cur = conn.cursor()
     query = sql.SQL("""
         INSERT INTO streams (
             stream_id,
@@ -47,21 +32,18 @@ def insert_data_to_postgresql_db(stream_id,
         )
     """)
 
-    cur.execute(query, (
-        stream_id,
-        broadcaster_username,
-        stream_title,
-        started_at,
-        ended_at,
-        start_follows,
-        end_follows,
-        start_subs,
-        end_subs
-    ))
-
-    conn.commit()
-    cur.close()
-    conn.close()
+    with get_cursor() as cur:
+        cur.execute(query, (
+            stream_id,
+            broadcaster_username,
+            stream_title,
+            started_at,
+            ended_at,
+            start_follows,
+            end_follows,
+            start_subs,
+            end_subs
+        ))
 
 def lambda_handler(event, context):
     try:
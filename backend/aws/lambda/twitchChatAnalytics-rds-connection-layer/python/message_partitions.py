@@ -0,0 +1,9 @@
+# messages is partitioned by month of timestamp (backend/aws/rds/migrations/V007__partition_messages_by_month.sql).
+# Queries on one stream without a time range add "timestamp >= (STREAM_START_BOUND)" with the stream_id
+# as parameter, so the monthly partitions before the stream started are pruned at execution time.
+# The hour of margin covers clock skew between the bot and Twitch; unknown streams are not bounded.
+STREAM_START_BOUND = """
+    SELECT COALESCE(min(started_at) - interval '1 hour', '-infinity')
+    FROM streams
+    WHERE stream_id = %s
+"""
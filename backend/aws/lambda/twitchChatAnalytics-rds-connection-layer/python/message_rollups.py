@@ -0,0 +1,107 @@
+from psycopg2.extras import execute_values
+
+ROLLUP_BUCKET_MINUTES = 5
+
+BUCKET_EXPRESSION = (
+    "date_trunc('hour', m.timestamp) "
+    f"+ floor(date_part('minute', m.timestamp) / {ROLLUP_BUCKET_MINUTES}) * interval '{ROLLUP_BUCKET_MINUTES} minutes'"
+)
+
+
+def update_message_rollups(cur, messages):
+    """
+    Adds the given messages to stream_message_rollups and stream_rollup_chatters.
+    Must run on the cursor that inserted the messages so both writes share one transaction.
+    Messages without stream_id are not rolled up.
+    """
+    rows = [
+        (
+            message['stream_id'],
+            message['broadcaster_user_login'],
+            message['chatter_user_login'],
+            message['timestamp'],
+            message['nlp_classification']
+        )
+        for message in messages
+        if message.get('stream_id')
+    ]
+    if not rows:
+        return
+
+    execute_values(cur, f"""
+        INSERT INTO stream_message_rollups (
+            stream_id,
+            bucket,
+            nlp_classification,
+            broadcaster_user_login,
+            message_count
+        )
+        SELECT m.stream_id, {BUCKET_EXPRESSION}, m.nlp_classification, m.broadcaster_user_login, COUNT(*)
+        FROM (VALUES %s) AS m (stream_id, broadcaster_user_login, chatter_user_login, timestamp, nlp_classification)
+        GROUP BY 1, 2, 3, 4
+        ORDER BY 1, 2, 3
+        ON CONFLICT (stream_id, bucket, nlp_classification)
+        DO UPDATE SET message_count = stream_message_rollups.message_count + EXCLUDED.message_count
+    """, rows, template="(%s, %s, %s, %s::timestamptz, %s)", page_size=len(rows))
+
+    execute_values(cur, f"""
+        INSERT INTO stream_rollup_chatters (
+            stream_id,
+            bucket,
+            chatter_user_login
+        )
+        SELECT DISTINCT m.stream_id, {BUCKET_EXPRESSION}, m.chatter_user_login
+        FROM (VALUES %s) AS m (stream_id, broadcaster_user_login, chatter_user_login, timestamp, nlp_classification)
+        ORDER BY 1, 2, 3
+        ON CONFLICT DO NOTHING
+    """, rows, template="(%s, %s, %s, %s::timestamptz, %s)", page_size=len(rows))
+
+
+def move_message_rollups(cur, changes):
+    """
+    Moves re-classified messages between labels in stream_message_rollups.
+    changes are dicts with stream_id, broadcaster_user_login, timestamp,
+    old_classification and nlp_classification (the new label).
+    Chatter rows do not depend on the label and are left untouched.
+    """
+    rows = [
+        (
+            change['stream_id'],
+            change['broadcaster_user_login'],
+            change['timestamp'],
+            change['old_classification'],
+            change['nlp_classification']
+        )
+        for change in changes
+        if change.get('stream_id')
+    ]
+    if not rows:
+        return
+
+    # Both labels of a change are applied by one upsert, so its row locks are taken in key order too
+    execute_values(cur, f"""
+        WITH m (stream_id, broadcaster_user_login, timestamp, old_classification, nlp_classification) AS (
+            VALUES %s
+        )
+        INSERT INTO stream_message_rollups (
+            stream_id,
+            bucket,
+            nlp_classification,
+            broadcaster_user_login,
+            message_count
+        )
+        SELECT d.stream_id, d.bucket, d.nlp_classification, d.broadcaster_user_login, SUM(d.delta)
+        FROM (
+            SELECT m.stream_id, {BUCKET_EXPRESSION} AS bucket, m.old_classification AS nlp_classification,
+                m.broadcaster_user_login, -1 AS delta
+            FROM m
+            UNION ALL
+            SELECT m.stream_id, {BUCKET_EXPRESSION}, m.nlp_classification, m.broadcaster_user_login, 1
+            FROM m
+        ) AS d
+        GROUP BY 1, 2, 3, 4
+        HAVING SUM(d.delta) <> 0
+        ORDER BY 1, 2, 3
+        ON CONFLICT (stream_id, bucket, nlp_classification)
+        DO UPDATE SET message_count = stream_message_rollups.message_count + EXCLUDED.message_count
+    """, rows, template="(%s, %s, %s::timestamptz, %s, %s)", page_size=len(rows))
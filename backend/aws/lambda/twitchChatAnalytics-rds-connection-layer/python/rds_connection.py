@@ -0,0 +1,167 @@
+import os
+import time
+from contextlib import contextmanager
+
+import psycopg2
+
+user_name = os.environ['USER_NAME']
+password = os.environ['PASSWORD']
+rds_host = os.environ['RDS_HOST']
+rds_port = os.environ.get('RDS_PORT')
+rds_db_name = os.environ['RDS_DB_NAME']
+
+# Idle connections older than this are pinged before being reused
+HEALTHCHECK_INTERVAL_SECONDS = int(os.environ.get('RDS_HEALTHCHECK_INTERVAL', 30))
+CONNECT_TIMEOUT_SECONDS = int(os.environ.get('RDS_CONNECT_TIMEOUT', 5))
+
+# Kept per container, reused across warm invocations
+_connection = None
+_last_used_at = 0.0
+
+connection_metrics = {
+    "reuse_hits": 0,
+    "reuse_misses": 0,
+    "reconnects": 0
+}
+
+
+def _connect():
+    return psycopg2.connect(
+        host=rds_host,
+        database=rds_db_name,
+        user=user_name,
+        password=password,
+        port=rds_port,
+        connect_timeout=CONNECT_TIMEOUT_SECONDS,
+        keepalives=1,
+        keepalives_idle=30,
+        keepalives_interval=10,
+        keepalives_count=3
+    )
+
+
+def _is_healthy(conn):
+    if conn.closed:
+        return False
+    if time.monotonic() - _last_used_at < HEALTHCHECK_INTERVAL_SECONDS:
+        return True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error as e:
+        print(f"RDS connection health check failed: {e}")
+        return False
+
+
+def close_connection():
+    """Closes the cached connection, the next call to get_connection opens a new one"""
+    global _connection
+    if _connection is not None:
+        try:
+            _connection.close()
+        except psycopg2.Error:
+            pass
+    _connection = None
+
+
+def get_connection():
+    """
+    Returns the container-wide connection to RDS.
+    The connection is health-checked and transparently re-established when it was dropped,
+    e.g. after a failover or an idle timeout.
+    """
+    connection, _ = _get_connection()
+    return connection
+
+
+def _get_connection():
+    """Same as get_connection, also tells whether the connection was reused without being pinged"""
+    global _connection, _last_used_at
+
+    unchecked = False
+    if _connection is not None and _is_healthy(_connection):
+        connection_metrics["reuse_hits"] += 1
+        unchecked = time.monotonic() - _last_used_at < HEALTHCHECK_INTERVAL_SECONDS
+    else:
+        if _connection is not None:
+            connection_metrics["reconnects"] += 1
+            close_connection()
+        connection_metrics["reuse_misses"] += 1
+        print(f"Establishing database connection... metrics: {connection_metrics}")
+        _connection = _connect()
+
+    _last_used_at = time.monotonic()
+    return _connection, unchecked
+
+
+class _ReconnectingCursor:
+    """
+    Cursor of get_cursor. A connection reused inside the health check window is not pinged,
+    so when the first statement finds it dead (e.g. after a failover) the statement is replayed
+    once on a new connection instead of failing the request.
+    """
+
+    def __init__(self, conn, unchecked, cursor_factory, name):
+        self._conn = conn
+        self._unchecked = unchecked
+        self._cursor_factory = cursor_factory
+        self._name = name
+        self._cursor = conn.cursor(name=name, cursor_factory=cursor_factory)
+        self._executed = False
+
+    def execute(self, query, vars=None):
+        if self._executed or not self._unchecked:
+            return self._cursor.execute(query, vars)
+
+        self._executed = True
+        try:
+            return self._cursor.execute(query, vars)
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            # Lock and statement timeouts are OperationalErrors too, they leave the connection open
+            if not self._conn.closed:
+                raise
+            print(f"RDS connection lost, reconnecting: {e}")
+            connection_metrics["reconnects"] += 1
+            close_connection()
+            itersize = self._cursor.itersize
+            self._conn, self._unchecked = _get_connection()
+            self._cursor = self._conn.cursor(name=self._name, cursor_factory=self._cursor_factory)
+            self._cursor.itersize = itersize
+            return self._cursor.execute(query, vars)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._cursor, name, value)
+
+
+@contextmanager
+def get_cursor(cursor_factory=None, name=None):
+    """
+    Yields a cursor on the shared connection and runs the block in its own transaction:
+    committed on success, rolled back on error. A broken connection is discarded
+    so that the next invocation reconnects.
+    """
+    conn, unchecked = _get_connection()
+    cur = _ReconnectingCursor(conn, unchecked, cursor_factory, name)
+    try:
+        yield cur
+        cur.close()
+        cur._conn.commit()
+    except Exception:
+        if cur._conn.closed:
+            close_connection()
+            raise
+        if not cur.closed:
+            cur.close()
+        cur._conn.rollback()
+        raise
@@ -0,0 +1,52 @@
+# Typed columns of stream_metadata (backend/aws/rds/migrations/V005__stream_metadata_columns.sql), in insert order.
+# Gauges are point-in-time values, averaged when snapshots are downsampled.
+STREAM_METADATA_GAUGES = [
+    "viewer_count",
+]
+# Counters hold the events since the previous snapshot (the bot resets them after every post), summed when downsampled
+STREAM_METADATA_COUNTERS = [
+    "follower_count",
+    "subscriber_count",
+    "message_count",
+    "very_negative_message_count",
+    "negative_message_count",
+    "slightly_negative_message_count",
+    "neutral_message_count",
+    "slightly_positive_message_count",
+    "positive_message_count",
+    "very_positive_message_count",
+]
+STREAM_METADATA_FIELDS = ["category"] + STREAM_METADATA_GAUGES + STREAM_METADATA_COUNTERS
+
+
+def parse_metadata_fields(fields):
+    """
+    Parses a comma separated list of stream_metadata fields, None or "" selects all of them.
+    Raises ValueError on unknown fields.
+    """
+    if not fields:
+        return list(STREAM_METADATA_FIELDS)
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in STREAM_METADATA_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return selected
+
+
+# Default and smallest useful resolution, the bot posts a snapshot every 5 minutes
+SNAPSHOT_INTERVAL_SECONDS = 300
+RESOLUTION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_resolution(resolution):
+    """Parses a resolution like "15m", "1h" or "900" into seconds, None selects SNAPSHOT_INTERVAL_SECONDS"""
+    if not resolution:
+        return SNAPSHOT_INTERVAL_SECONDS
+    unit = RESOLUTION_UNITS.get(resolution[-1])
+    try:
+        seconds = int(resolution[:-1]) * unit if unit else int(resolution)
+    except ValueError:
+        raise ValueError(f"Invalid resolution: {resolution}, expected e.g. 15m, 1h or 900")
+    if seconds <= 0:
+        raise ValueError("resolution must be positive")
+    return seconds
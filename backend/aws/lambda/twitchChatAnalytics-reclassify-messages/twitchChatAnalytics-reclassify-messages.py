@@ -0,0 +1,199 @@
+import json
+import os
+import time
+from psycopg2.extras import execute_values
+from rds_connection import get_cursor
+from message_rollups import move_message_rollups
+from sentiment_classification import classify_sentiment_batch
+from sentiment_lexicon import PRE_CLASSIFIER_SOURCE
+
+DEFAULT_CHUNK_SIZE = int(os.environ.get('RECLASSIFY_CHUNK_SIZE', 5000))
+MAX_CHUNK_SIZE = 50000
+# Stop picking up new chunks when less time than this is left, the next run resumes from the checkpoint
+TIME_RESERVE_MILLIS = int(os.environ.get('RECLASSIFY_TIME_RESERVE_MILLIS', 30000))
+DEFAULT_JOB_NAME = "default"
+
+
+def start_job(job_name, restart=False):
+    """Creates the checkpoint row of the job, or rewinds it to the first message when restart is set"""
+    with get_cursor() as cur:
+        if restart:
+            cur.execute("""
+                INSERT INTO message_reclassification_jobs (job_name)
+                VALUES (%s)
+                ON CONFLICT (job_name) DO UPDATE SET
+                    last_message_id = 0,
+                    processed_count = 0,
+                    updated_count = 0,
+                    started_at = now(),
+                    updated_at = now(),
+                    finished_at = NULL
+            """, (job_name,))
+        else:
+            cur.execute("""
+                INSERT INTO message_reclassification_jobs (job_name)
+                VALUES (%s)
+                ON CONFLICT (job_name) DO NOTHING
+            """, (job_name,))
+
+
+def reclassify_chunk(job_name, chunk_size):
+    """
+    Re-classifies the next chunk of messages after the job checkpoint.
+    The label updates, the rollup corrections and the new checkpoint are committed in one transaction,
+    so an interrupted run never applies a chunk twice.
+    Returns (processed, updated, done).
+    """
+    with get_cursor() as cur:
+        # Row lock keeps two runs of the same job from processing the same chunk
+        cur.execute("""
+            SELECT last_message_id
+            FROM message_reclassification_jobs
+            WHERE job_name = %s
+            FOR UPDATE
+        """, (job_name,))
+        last_message_id = cur.fetchone()[0]
+
+        cur.execute("""
+            SELECT
+                id,
+                stream_id,
+                broadcaster_user_login,
+                timestamp,
+                nlp_classification,
+                sentiment_score,
+                sentiment_magnitude
+            FROM messages
+            WHERE id > %s
+              AND sentiment_score IS NOT NULL
+              AND sentiment_magnitude IS NOT NULL
+              -- Hand-picked lexicon scores say nothing about the thresholds of the API scale
+              AND sentiment_source IS DISTINCT FROM %s
+            ORDER BY id
+            LIMIT %s
+        """, (last_message_id, PRE_CLASSIFIER_SOURCE, chunk_size))
+        rows = cur.fetchall()
+
+        if not rows:
+            cur.execute("""
+                UPDATE message_reclassification_jobs
+                SET finished_at = COALESCE(finished_at, now()), updated_at = now()
+                WHERE job_name = %s
+            """, (job_name,))
+            return 0, 0, True
+
+        labels = classify_sentiment_batch([row[5] for row in rows], [row[6] for row in rows])
+        changes = [
+            {
+                "id": row[0],
+                "stream_id": row[1],
+                "broadcaster_user_login": row[2],
+                "timestamp": row[3],
+                "old_classification": row[4],
+                "nlp_classification": label
+            }
+            for row, label in zip(rows, labels.tolist())
+            if row[4] != label
+        ]
+
+        if changes:
+            execute_values(cur, """
+                UPDATE messages AS m
+                SET nlp_classification = v.nlp_classification
+                FROM (VALUES %s) AS v (id, timestamp, nlp_classification)
+                WHERE m.id = v.id AND m.timestamp = v.timestamp
+            """, [
+                (change["id"], change["timestamp"], change["nlp_classification"]) for change in changes
+            ], page_size=len(changes))
+            move_message_rollups(cur, changes)
+
+        cur.execute("""
+            UPDATE message_reclassification_jobs
+            SET last_message_id = %s,
+                processed_count = processed_count + %s,
+                updated_count = updated_count + %s,
+                updated_at = now()
+            WHERE job_name = %s
+        """, (rows[-1][0], len(rows), len(changes), job_name))
+
+        return len(rows), len(changes), False
+
+
+def get_job_progress(job_name):
+    with get_cursor() as cur:
+        cur.execute("""
+            SELECT last_message_id, processed_count, updated_count, started_at, finished_at
+            FROM message_reclassification_jobs
+            WHERE job_name = %s
+        """, (job_name,))
+        last_message_id, processed_count, updated_count, started_at, finished_at = cur.fetchone()
+    return {
+        "last_message_id": last_message_id,
+        "processed_count": processed_count,
+        "updated_count": updated_count,
+        "started_at": started_at.isoformat(),
+        "finished_at": finished_at.isoformat() if finished_at else None
+    }
+
+
+def lambda_handler(event, context):
+    """
+    Re-applies the current sentiment rules to stored messages, chunk by chunk.
+    Runs until every message is processed or the Lambda is about to time out;
+    invoking it again with the same job_name continues where the previous run stopped.
+    """
+    event = event or {}
+    job_name = event.get("job_name", DEFAULT_JOB_NAME)
+    restart = bool(event.get("restart", False))
+
+    try:
+        chunk_size = int(event.get("chunk_size", DEFAULT_CHUNK_SIZE))
+    except (TypeError, ValueError):
+        return {
+            "statusCode": 400,
+            "body": json.dumps({"error": "chunk_size must be an integer"})
+        }
+    if chunk_size < 1 or chunk_size > MAX_CHUNK_SIZE:
+        return {
+            "statusCode": 400,
+            "body": json.dumps({"error": f"chunk_size must be between 1 and {MAX_CHUNK_SIZE}"})
+        }
+
+    try:
+        start_job(job_name, restart)
+
+        started_at = time.perf_counter()
+        processed = 0
+        updated = 0
+        done = False
+        while not done:
+            if context is not None and context.get_remaining_time_in_millis() < TIME_RESERVE_MILLIS:
+                print("Stopping before timeout, the next run resumes from the checkpoint")
+                break
+            chunk_processed, chunk_updated, done = reclassify_chunk(job_name, chunk_size)
+            processed += chunk_processed
+            updated += chunk_updated
+            print(f"Re-classified chunk: {chunk_processed} rows, {chunk_updated} changed")
+
+        elapsed_seconds = time.perf_counter() - started_at
+        rows_per_second = processed / elapsed_seconds if elapsed_seconds > 0 else 0.0
+        print(f"Processed {processed} rows, {updated} changed, {rows_per_second:.0f} rows/s")
+
+        return {
+            "statusCode": 200,
+            "body": json.dumps({
+                "job_name": job_name,
+                "done": done,
+                "processed": processed,
+                "updated": updated,
+                "elapsed_seconds": round(elapsed_seconds, 3),
+                "rows_per_second": round(rows_per_second, 1),
+                "job": get_job_progress(job_name)
+            })
+        }
+    except Exception as e:
+        print(f"Error: {e}")
+        return {
+            "statusCode": 500,
+            "body": json.dumps({"error": str(e)})
+        }
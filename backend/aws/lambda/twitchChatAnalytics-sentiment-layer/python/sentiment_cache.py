@@ -0,0 +1,147 @@
+import hashlib
+import os
+import time
+import unicodedata
+from collections import OrderedDict
+from decimal import Decimal
+
+import boto3
+
+SENTIMENT_CACHE_MAX_SIZE = int(os.environ.get('SENTIMENT_CACHE_MAX_SIZE', 10000))
+# DynamoDB table shared by all containers, the shared tier is disabled when unset
+SENTIMENT_CACHE_TABLE = os.environ.get('SENTIMENT_CACHE_TABLE')
+SENTIMENT_CACHE_TTL_SECONDS = int(os.environ.get('SENTIMENT_CACHE_TTL', 7 * 24 * 60 * 60))
+# Bump when the normalization changes so old entries are no longer matched
+CACHE_KEY_VERSION = "v1"
+# batch_get_item accepts at most 100 keys per request
+SHARED_BATCH_GET_SIZE = 100
+
+# Kept per container: text hash -> (score, magnitude), least recently used first
+sentiment_cache = OrderedDict()
+sentiment_cache_metrics = {
+    "lookups": 0,
+    "local_hits": 0,
+    "shared_hits": 0,
+    "misses": 0
+}
+
+_shared_table = None
+
+
+def get_shared_table():
+    global _shared_table
+    if _shared_table is None and SENTIMENT_CACHE_TABLE:
+        _shared_table = boto3.resource('dynamodb').Table(SENTIMENT_CACHE_TABLE)
+    return _shared_table
+
+
+def normalize_message_text(text):
+    """
+    Folds the variations of chat spam onto one text: unicode compatibility forms, case,
+    whitespace and repeated tokens, so "LUL  LUL lul" and "lul" share a cache entry.
+    """
+    tokens = unicodedata.normalize("NFKC", text).casefold().split()
+    collapsed = [token for i, token in enumerate(tokens) if i == 0 or token != tokens[i - 1]]
+    return " ".join(collapsed)
+
+
+def sentiment_cache_key(text, namespace="google"):
+    """Hash of the normalized text, namespace keeps the results of different sentiment backends apart"""
+    normalized = normalize_message_text(text)
+    return hashlib.sha256(f"{CACHE_KEY_VERSION}:{namespace}:{normalized}".encode()).hexdigest()
+
+
+def _remember(key, sentiment):
+    sentiment_cache[key] = sentiment
+    sentiment_cache.move_to_end(key)
+    while len(sentiment_cache) > SENTIMENT_CACHE_MAX_SIZE:
+        sentiment_cache.popitem(last=False)
+
+
+def _get_shared(keys):
+    table = get_shared_table()
+    if table is None or not keys:
+        return {}
+
+    found = {}
+    now = int(time.time())
+    try:
+        for start in range(0, len(keys), SHARED_BATCH_GET_SIZE):
+            response = table.meta.client.batch_get_item(RequestItems={
+                SENTIMENT_CACHE_TABLE: {
+                    "Keys": [{"text_hash": key} for key in keys[start:start + SHARED_BATCH_GET_SIZE]],
+                    "ProjectionExpression": "text_hash, score, magnitude, expires_at"
+                }
+            })
+            # Unprocessed keys are treated as misses instead of delaying the batch with retries
+            for item in response.get("Responses", {}).get(SENTIMENT_CACHE_TABLE, []):
+                # TTL deletion is lazy, expired items can still be returned
+                if int(item.get("expires_at", 0)) > now:
+                    found[item["text_hash"]] = (float(item["score"]), float(item["magnitude"]))
+    except Exception as e:
+        print(f"Shared sentiment cache read failed: {e}")
+    return found
+
+
+def get_cached_sentiments(keys):
+    """
+    Looks up the (score, magnitude) of every key, first in the container LRU, then in the shared table.
+    Returns a dict of the keys found. Every key counts as one lookup, a key missed several times
+    in the same call counts as one miss, the repetitions are served by the first API result.
+    """
+    found = {}
+    # dict keeps the first-seen order of the missing keys
+    missing = {}
+    for key in keys:
+        if key in sentiment_cache:
+            sentiment_cache.move_to_end(key)
+            found[key] = sentiment_cache[key]
+            sentiment_cache_metrics["local_hits"] += 1
+        else:
+            missing[key] = None
+
+    shared = _get_shared(list(missing))
+    for key, sentiment in shared.items():
+        _remember(key, sentiment)
+    found.update(shared)
+
+    sentiment_cache_metrics["lookups"] += len(keys)
+    sentiment_cache_metrics["shared_hits"] += sum(1 for key in keys if key in shared)
+    sentiment_cache_metrics["misses"] += len(missing) - len(shared)
+    return found
+
+
+def store_sentiments(sentiments):
+    """Adds freshly analyzed key -> (score, magnitude) pairs to both tiers"""
+    for key, sentiment in sentiments.items():
+        _remember(key, sentiment)
+
+    table = get_shared_table()
+    if table is None or not sentiments:
+        return
+
+    expires_at = int(time.time()) + SENTIMENT_CACHE_TTL_SECONDS
+    try:
+        with table.batch_writer(overwrite_by_pkeys=["text_hash"]) as batch:
+            for key, (score, magnitude) in sentiments.items():
+                batch.put_item(Item={
+                    "text_hash": key,
+                    "score": Decimal(str(score)),
+                    "magnitude": Decimal(str(magnitude)),
+                    "expires_at": expires_at
+                })
+    except Exception as e:
+        print(f"Shared sentiment cache write failed: {e}")
+
+
+def cache_hit_ratios(metrics=None):
+    """Hit ratios of the given metrics, by default the container totals"""
+    metrics = metrics or sentiment_cache_metrics
+    lookups = metrics["lookups"]
+    if lookups == 0:
+        return {"hit_ratio": 0.0, "local_hit_ratio": 0.0, "shared_hit_ratio": 0.0}
+    return {
+        "hit_ratio": round((lookups - metrics["misses"]) / lookups, 4),
+        "local_hit_ratio": round(metrics["local_hits"] / lookups, 4),
+        "shared_hit_ratio": round(metrics["shared_hits"] / lookups, 4)
+    }
@@ -0,0 +1,52 @@
+import math
+
+import numpy as np
+
+# Classification thresholds, evaluated in order, the first matching rule wins:
+# (score below, magnitude above or None when the magnitude does not matter, label)
+SENTIMENT_RULES = [
+    (-0.8, None, "Very Negative"),
+    (-0.6, 2, "Very Negative"),
+    (-0.4, 4, "Very Negative"),
+    (-0.6, None, "Negative"),
+    (-0.4, 2, "Negative"),
+    (-0.2, 4, "Negative"),
+    (-0.3, None, "Slightly Negative"),
+    (-0.1, 2, "Slightly Negative"),
+    (0.1, 4, "Slightly Negative"),
+    (0.3, None, "Neutral"),
+    (0.5, None, "Slightly Positive"),
+    (0.7, None, "Positive"),
+]
+DEFAULT_LABEL = "Very Positive"
+
+
+def classify_sentiment(score, magnitude, rules=SENTIMENT_RULES, default_label=DEFAULT_LABEL):
+    """Classifies a single (score, magnitude) pair, rules are checked lazily in order"""
+    # Missing values compare false against every threshold, like the NaNs of classify_sentiment_batch
+    score = math.nan if score is None else score
+    magnitude = math.nan if magnitude is None else magnitude
+    for score_below, magnitude_above, label in rules:
+        if score < score_below and (magnitude_above is None or magnitude > magnitude_above):
+            return label
+    return default_label
+
+
+def classify_sentiment_batch(scores, magnitudes, rules=SENTIMENT_RULES, default_label=DEFAULT_LABEL):
+    """
+    Classifies arrays of scores and magnitudes in one vectorized pass.
+    Returns an object array of labels, identical to calling classify_sentiment on every pair.
+    None becomes NaN, which matches no rule and gets the default label.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    magnitudes = np.asarray(magnitudes, dtype=np.float64)
+
+    conditions = [
+        scores < score_below if magnitude_above is None else (scores < score_below) & (magnitudes > magnitude_above)
+        for score_below, magnitude_above, _ in rules
+    ]
+    labels = np.array([label for _, _, label in rules] + [default_label], dtype=object)
+
+    # np.select takes the first true condition, same as the scalar rule order
+    rule_indexes = np.select(conditions, np.arange(len(rules)), default=len(rules))
+    return labels[rule_indexes]
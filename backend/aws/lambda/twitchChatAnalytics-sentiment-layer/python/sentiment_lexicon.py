@@ -0,0 +1,103 @@
+import re
+
+from sentiment_cache import normalize_message_text
+
+# Sentiment score in [-1, 1] of emotes, emoji and one-word reactions, keys are casefolded
+# like the normalized message text. Ambiguous emotes (Kappa, EZ, ...) are left out on purpose.
+LEXICON = {
+    # positive
+    "w": 0.6, "pog": 0.7, "pogchamp": 0.7, "poggers": 0.7, "pogu": 0.7, "kreygasm": 0.7,
+    "seemsgood": 0.6, "hype": 0.7, "gg": 0.6, "ggs": 0.6, "ggwp": 0.6, "clutch": 0.6,
+    "nice": 0.6, "love": 0.8, "great": 0.7, "awesome": 0.8, "amazing": 0.8, "<3": 0.8,
+    "bloodtrail": 0.5, "catjam": 0.5, "peepohappy": 0.7, "widepeepohappy": 0.7,
+    "lol": 0.4, "lul": 0.4, "kekw": 0.4, "omegalul": 0.5, "lmao": 0.4, "haha": 0.4,
+    "😂": 0.4, "❤️": 0.8, "❤": 0.8, "🔥": 0.6, "👍": 0.5, "😍": 0.8, "🎉": 0.7,
+    # negative
+    "l": -0.6, "biblethump": -0.6, "residentsleeper": -0.5, "notlikethis": -0.6, "feelsbadman": -0.7,
+    "sadge": -0.6, "pepehands": -0.6, "wutface": -0.5, "dansgame": -0.6, "trash": -0.7,
+    "cringe": -0.6, "boring": -0.6, "bad": -0.6, "sad": -0.6, "rip": -0.4,
+    "😢": -0.6, "😭": -0.5, "👎": -0.5, "😡": -0.8,
+    # neutral
+    "hi": 0.0, "hello": 0.0, "hey": 0.0, "o7": 0.1, "first": 0.0, "?": 0.0, "??": 0.0, "!": 0.0,
+}
+
+# Flip the polarity of the next known token
+NEGATIONS = {"not", "no", "never", "dont", "don't", "isnt", "isn't", "wasnt", "wasn't", "cant", "can't"}
+# Extra words for lexicon_document_sentiment, which scores full messages instead of trivial ones
+DOCUMENT_LEXICON = {
+    **LEXICON,
+    "good": 0.6, "best": 0.8, "fun": 0.6, "funny": 0.5, "cool": 0.5, "happy": 0.7, "thanks": 0.5,
+    "thank": 0.5, "wow": 0.5, "beautiful": 0.8, "insane": 0.5, "win": 0.6, "won": 0.6, "like": 0.3,
+    "worst": -0.8, "terrible": -0.8, "awful": -0.8, "hate": -0.8, "lose": -0.5, "lost": -0.5,
+    "stupid": -0.7, "annoying": -0.6, "lag": -0.4, "angry": -0.7, "wtf": -0.4, "ugly": -0.7,
+}
+
+URL_PATTERN = re.compile(r"^(https?://|www\.)\S+$")
+NUMBER_PATTERN = re.compile(r"^\d+$")
+# Longer messages carry context the lexicon cannot see and always go to the remote API
+MAX_TOKENS = 4
+# Every known token halves the remaining doubt: 1 token 0.5, 2 tokens 0.75, 3 tokens 0.875, 4 tokens 0.9375
+TOKEN_EVIDENCE = 0.5
+# sentiment_source stored with the messages scored by lexicon_sentiment, kept out of re-classification and corpora
+PRE_CLASSIFIER_SOURCE = "lexicon_pre_classifier"
+PUNCTUATION = ".,!?:;'\"()"
+
+
+def _token_score(token):
+    if token in LEXICON:
+        return LEXICON[token]
+    if URL_PATTERN.match(token) or NUMBER_PATTERN.match(token):
+        return 0.0
+    stripped = token.strip(PUNCTUATION)
+    if stripped == "":
+        return 0.0
+    return LEXICON.get(stripped)
+
+
+def lexicon_sentiment(text):
+    """
+    Scores trivial chat lines locally: links, numbers, emotes and one-word reactions.
+    Returns (score, magnitude, confidence) on the NLP API scale, or None when the text is not trivial.
+    Confidence is the share of known tokens times how much their polarities agree, times the evidence
+    of the number of known tokens, so a single emote is never as certain as several agreeing ones.
+    The scores are hand-picked, validate a threshold with benchmark_pre_classifier.py before relying on it.
+    """
+    tokens = normalize_message_text(text).split()
+    if not tokens or len(tokens) > MAX_TOKENS:
+        return None
+
+    scores = [_token_score(token) for token in tokens]
+    known = [score for score in scores if score is not None]
+    if not known:
+        return None
+
+    score = sum(known) / len(known)
+    # Magnitude adds up the emotional content of the tokens, like the NLP API does over sentences
+    magnitude = sum(abs(token_score) for token_score in known)
+    agreement = abs(sum(known)) / magnitude if magnitude else 1.0
+    evidence = 1 - TOKEN_EVIDENCE ** len(known)
+    confidence = len(known) / len(tokens) * agreement * evidence
+    return score, magnitude, confidence
+
+
+def lexicon_document_sentiment(text):
+    """
+    Local stand-in for the NLP API: scores any text from DOCUMENT_LEXICON with simple negation handling.
+    Returns (score, magnitude) with the API contract, score in [-1, 1] and magnitude >= 0;
+    texts without known words are neutral.
+    """
+    known = []
+    negate = False
+    for token in normalize_message_text(text).split():
+        if token in NEGATIONS:
+            negate = True
+            continue
+        token_score = DOCUMENT_LEXICON.get(token, DOCUMENT_LEXICON.get(token.strip(PUNCTUATION)))
+        if token_score is not None:
+            known.append(-token_score if negate else token_score)
+            negate = False
+
+    if not known:
+        return 0.0, 0.0
+    score = max(-1.0, min(1.0, sum(known) / len(known)))
+    return score, sum(abs(token_score) for token_score in known)
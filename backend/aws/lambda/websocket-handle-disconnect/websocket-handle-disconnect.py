@@ -1,16 +1,43 @@
 import boto3
+from botocore.exceptions import ClientError
+
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table('WebsocketConnections')
+# Reverse index: connection_id -> streamer_names the connection is registered for
+index_table = dynamodb.Table('WebsocketConnectionIndex')
+
+
+def remove_connection_from_streamer(streamer_name, connection_id):
+    """
+    Atomically removes connection_id from the streamer's connection set.
+    """
+    try:
+        table.update_item(
+            Key={'streamer_name': streamer_name},
+            UpdateExpression="DELETE connection_ids :connection_id",
+            ExpressionAttributeValues={':connection_id': {connection_id}}
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ValidationException':
+            raise
+        # connection_ids is still stored as a list by an older version of register-connection
+        response = table.get_item(Key={'streamer_name': streamer_name})
+        connection_ids = response.get('Item', {}).get('connection_ids', [])
+        table.update_item(
+            Key={'streamer_name': streamer_name},
+            UpdateExpression="SET connection_ids = :new_list",
+            ExpressionAttributeValues={':new_list': [id for id in connection_ids if id != connection_id]}
+        )
+
 
 def lambda_handler(event, context):
     connection_id = event['requestContext']['connectionId']
-    response = table.scan()
-    for item in response['Items']:
-        if connection_id in item['connection_ids']:
-            updated_list = [id for id in item['connection_ids'] if id != connection_id]
-            table.update_item(
-                Key={'streamer_name': item['streamer_name']},
-                UpdateExpression="SET connection_ids = :new_list",
-                ExpressionAttributeValues={':new_list': updated_list}
-            )
+
+    response = index_table.get_item(Key={'connection_id': connection_id})
+    streamer_names = response.get('Item', {}).get('streamer_names', set())
+
+    for streamer_name in streamer_names:
+        remove_connection_from_streamer(streamer_name, connection_id)
+
+    index_table.delete_item(Key={'connection_id': connection_id})
     return {"statusCode": 200}
@@ -1,8 +1,111 @@
 import boto3
 import json
+import random
+import time
+from botocore.exceptions import ClientError
+
+TABLE_NAME = 'WebsocketConnections'
+# Reverse index: connection_id -> streamer_names the connection is registered for
+INDEX_TABLE_NAME = 'WebsocketConnectionIndex'
+# Index items expire through DynamoDB TTL on expires_at in case the disconnect event was lost
+INDEX_ITEM_TTL_SECONDS = 24 * 60 * 60
+# Concurrent registrations for a popular streamer conflict on its item, they are retried with jittered backoff
+REGISTER_MAX_ATTEMPTS = 5
+REGISTER_BACKOFF_BASE_SECONDS = 0.05
+RETRYABLE_CANCELLATION_CODES = {'TransactionConflict', 'ThrottlingError', 'ProvisionedThroughputExceeded'}
 
 dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table('WebsocketConnections')
+table = dynamodb.Table(TABLE_NAME)
+dynamodb_client = boto3.client('dynamodb')
+
+
+def migrate_connection_list_to_set(streamer_name):
+    """
+    Converts a connection_ids list written by older versions of this lambda into a string set.
+    """
+    response = table.get_item(Key={'streamer_name': streamer_name})
+    connection_ids = response.get('Item', {}).get('connection_ids')
+    if not isinstance(connection_ids, list):
+        return
+
+    if connection_ids:
+        table.update_item(
+            Key={'streamer_name': streamer_name},
+            UpdateExpression="SET connection_ids = :connection_ids",
+            ConditionExpression="connection_ids = :old_connection_ids",
+            ExpressionAttributeValues={
+                ':connection_ids': set(connection_ids),
+                ':old_connection_ids': connection_ids
+            }
+        )
+    else:
+        table.update_item(
+            Key={'streamer_name': streamer_name},
+            UpdateExpression="REMOVE connection_ids",
+            ConditionExpression="connection_ids = :old_connection_ids",
+            ExpressionAttributeValues={':old_connection_ids': connection_ids}
+        )
+    print(f"Migrated connection_ids of {streamer_name} to a string set")
+
+
+def register_connection(streamer_name, connection_id):
+    """
+    Adds connection_id to the streamer's connection set and the streamer to the connection's index item.
+    Both sides of the registry are written in one transaction so they never diverge.
+    """
+    dynamodb_client.transact_write_items(
+        TransactItems=[
+            {
+                'Update': {
+                    'TableName': TABLE_NAME,
+                    'Key': {'streamer_name': {'S': streamer_name}},
+                    'UpdateExpression': "ADD connection_ids :new_conn",
+                    'ConditionExpression': "attribute_not_exists(connection_ids) OR attribute_type(connection_ids, :string_set)",
+                    'ExpressionAttributeValues': {
+                        ':new_conn': {'SS': [connection_id]},
+                        ':string_set': {'S': 'SS'}
+                    }
+                }
+            },
+            {
+                'Update': {
+                    'TableName': INDEX_TABLE_NAME,
+                    'Key': {'connection_id': {'S': connection_id}},
+                    'UpdateExpression': "ADD streamer_names :streamer_name SET expires_at = :expires_at",
+                    'ExpressionAttributeValues': {
+                        ':streamer_name': {'SS': [streamer_name]},
+                        ':expires_at': {'N': str(int(time.time()) + INDEX_ITEM_TTL_SECONDS)}
+                    }
+                }
+            }
+        ]
+    )
+
+def register_connection_with_retries(streamer_name, connection_id):
+    """
+    Registers the connection, looking at why a cancelled transaction failed:
+    a failed type check on the streamer item means a legacy list, which is migrated once;
+    conflicts and throttling are retried with backoff; anything else is raised.
+    """
+    migrated = False
+    for attempt in range(REGISTER_MAX_ATTEMPTS):
+        try:
+            register_connection(streamer_name, connection_id)
+            return
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'TransactionCanceledException' or attempt == REGISTER_MAX_ATTEMPTS - 1:
+                raise
+
+            # One reason per transaction item, the first one is the streamer item with the type check
+            codes = [reason.get('Code') for reason in e.response.get('CancellationReasons', [])]
+            if codes and codes[0] == 'ConditionalCheckFailed' and not migrated:
+                migrate_connection_list_to_set(streamer_name)
+                migrated = True
+            elif RETRYABLE_CANCELLATION_CODES.intersection(codes):
+                print(f"Registration of {connection_id} for {streamer_name} cancelled ({codes}), retrying")
+                time.sleep(random.uniform(0, REGISTER_BACKOFF_BASE_SECONDS * 2 ** attempt))
+            else:
+                raise
 
 expected_action = 'registerConnection'
 required_fields = ['action', 'streamer_name']
@@ -37,13 +140,6 @@ def lambda_handler(event, context):
     if not streamer_name:
         return {"statusCode": 400, "body": "streamer_name is required"}
 
-    table.update_item(
-        Key={'streamer_name': streamer_name},
-        UpdateExpression="SET connection_ids = list_append(if_not_exists(connection_ids, :empty_list), :new_conn)",
-        ExpressionAttributeValues={
-            ':new_conn': [connection_id],
-            ':empty_list': []
-        }
-    )
+    register_connection_with_retries(streamer_name, connection_id)
 
     return {"statusCode": 200, "body": "Connection registered"}
@@ -0,0 +1,31 @@
+-- Tables as they were created before the schema was versioned.
+-- IF NOT EXISTS keeps this a no-op on the existing database, new environments start from here.
+
+CREATE TABLE IF NOT EXISTS streams (
+    stream_id             VARCHAR(255) PRIMARY KEY,
+    broadcaster_username  VARCHAR(255) NOT NULL,
+    stream_title          TEXT,
+    started_at            TIMESTAMPTZ,
+    ended_at              TIMESTAMPTZ,
+    start_follows         INTEGER,
+    end_follows           INTEGER,
+    start_subs            INTEGER,
+    end_subs              INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id                      BIGSERIAL    PRIMARY KEY,
+    stream_id               VARCHAR(255),
+    broadcaster_user_login  VARCHAR(255) NOT NULL,
+    chatter_user_login      VARCHAR(255) NOT NULL,
+    message_text            TEXT,
+    timestamp               TIMESTAMPTZ  NOT NULL,
+    nlp_classification      VARCHAR(50)
+);
+
+CREATE TABLE IF NOT EXISTS stream_metadata (
+    id         BIGSERIAL    PRIMARY KEY,
+    stream_id  VARCHAR(255) NOT NULL,
+    timestamp  TIMESTAMPTZ  NOT NULL,
+    metadata   JSONB        NOT NULL
+);
@@ -0,0 +1,56 @@
+-- Per-stream rollups of the messages table, maintained incrementally by
+-- messages-add-to-rds and messages-post-lambda in the same transaction as the message insert.
+-- Buckets are 5 minutes wide, matching the stream_metadata snapshots sent by the bot.
+
+CREATE TABLE IF NOT EXISTS stream_message_rollups (
+    stream_id               VARCHAR(255) NOT NULL,
+    bucket                  TIMESTAMPTZ  NOT NULL,
+    nlp_classification      VARCHAR(50)  NOT NULL,
+    broadcaster_user_login  VARCHAR(255) NOT NULL,
+    message_count           INTEGER      NOT NULL DEFAULT 0,
+    PRIMARY KEY (stream_id, bucket, nlp_classification)
+);
+
+-- One row per chatter per bucket, unique chatters of a bucket are counted from its primary key range
+CREATE TABLE IF NOT EXISTS stream_rollup_chatters (
+    stream_id           VARCHAR(255) NOT NULL,
+    bucket              TIMESTAMPTZ  NOT NULL,
+    chatter_user_login  VARCHAR(255) NOT NULL,
+    PRIMARY KEY (stream_id, bucket, chatter_user_login)
+);
+
+-- Backfill of the messages stored before the rollups were maintained. Same bucket expression as
+-- BUCKET_EXPRESSION in twitchChatAnalytics-rds-connection-layer/python/message_rollups.py.
+-- Buckets that already have a row were written by the Lambdas and are left untouched, so re-running is a no-op.
+INSERT INTO stream_message_rollups (
+    stream_id,
+    bucket,
+    nlp_classification,
+    broadcaster_user_login,
+    message_count
+)
+SELECT
+    m.stream_id,
+    date_trunc('hour', m.timestamp) + floor(date_part('minute', m.timestamp) / 5) * interval '5 minutes',
+    m.nlp_classification,
+    min(m.broadcaster_user_login),
+    COUNT(*)
+FROM messages m
+WHERE m.stream_id IS NOT NULL AND m.nlp_classification IS NOT NULL
+GROUP BY 1, 2, 3
+ORDER BY 1, 2, 3
+ON CONFLICT DO NOTHING;
+
+INSERT INTO stream_rollup_chatters (
+    stream_id,
+    bucket,
+    chatter_user_login
+)
+SELECT DISTINCT
+    m.stream_id,
+    date_trunc('hour', m.timestamp) + floor(date_part('minute', m.timestamp) / 5) * interval '5 minutes',
+    m.chatter_user_login
+FROM messages m
+WHERE m.stream_id IS NOT NULL
+ORDER BY 1, 2, 3
+ON CONFLICT DO NOTHING;
@@ -0,0 +1,15 @@
+-- Raw Google NLP sentiment of every message, so nlp_classification can be recomputed
+-- when the thresholds in sentiment_classification.py change. Older rows keep NULL.
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS sentiment_score DOUBLE PRECISION;
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS sentiment_magnitude DOUBLE PRECISION;
+
+-- Progress of twitchChatAnalytics-reclassify-messages runs, one row per job_name
+CREATE TABLE IF NOT EXISTS message_reclassification_jobs (
+    job_name         VARCHAR(255) PRIMARY KEY,
+    last_message_id  BIGINT       NOT NULL DEFAULT 0,
+    processed_count  BIGINT       NOT NULL DEFAULT 0,
+    updated_count    BIGINT       NOT NULL DEFAULT 0,
+    started_at       TIMESTAMPTZ  NOT NULL DEFAULT now(),
+    updated_at       TIMESTAMPTZ  NOT NULL DEFAULT now(),
+    finished_at      TIMESTAMPTZ
+);
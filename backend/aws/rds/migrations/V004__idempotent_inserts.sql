@@ -0,0 +1,18 @@
+-- Natural keys used by the SQS consumers to make redelivered records a no-op
+-- (INSERT ... ON CONFLICT DO NOTHING in messages-post-lambda, messages-add-to-rds and post-stream-metadata).
+
+-- Twitch chat message id, NULL for rows stored before it was persisted
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS message_id VARCHAR(255);
+-- Once V007 partitioned messages the key is (message_id, timestamp), a unique index without the partition key is rejected
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'messages'::regclass) THEN
+        CREATE UNIQUE INDEX IF NOT EXISTS messages_message_id_key ON messages (message_id);
+    END IF;
+END;
+$$;
+
+-- Fails while duplicate snapshots exist, remove them first:
+-- DELETE FROM stream_metadata a USING stream_metadata b
+-- WHERE a.ctid > b.ctid AND a.stream_id = b.stream_id AND a.timestamp = b.timestamp;
+CREATE UNIQUE INDEX IF NOT EXISTS stream_metadata_stream_id_timestamp_key ON stream_metadata (stream_id, timestamp);
@@ -0,0 +1,39 @@
+-- Typed columns for the stream_metadata snapshots, replacing the JSON metadata blob.
+-- Time-series reads use the (stream_id, timestamp) index from V004__idempotent_inserts.sql
+-- and only touch the selected columns.
+
+ALTER TABLE stream_metadata
+    ADD COLUMN IF NOT EXISTS category                        VARCHAR(255),
+    ADD COLUMN IF NOT EXISTS viewer_count                    INTEGER,
+    ADD COLUMN IF NOT EXISTS follower_count                  INTEGER,
+    ADD COLUMN IF NOT EXISTS subscriber_count                INTEGER,
+    ADD COLUMN IF NOT EXISTS message_count                   INTEGER,
+    ADD COLUMN IF NOT EXISTS very_negative_message_count     INTEGER,
+    ADD COLUMN IF NOT EXISTS negative_message_count          INTEGER,
+    ADD COLUMN IF NOT EXISTS slightly_negative_message_count INTEGER,
+    ADD COLUMN IF NOT EXISTS neutral_message_count           INTEGER,
+    ADD COLUMN IF NOT EXISTS slightly_positive_message_count INTEGER,
+    ADD COLUMN IF NOT EXISTS positive_message_count          INTEGER,
+    ADD COLUMN IF NOT EXISTS very_positive_message_count     INTEGER;
+
+-- New snapshots are written to the typed columns only
+ALTER TABLE stream_metadata ALTER COLUMN metadata DROP NOT NULL;
+
+-- Backfill of the snapshots written before
+UPDATE stream_metadata SET
+    category                        = metadata::jsonb ->> 'category',
+    viewer_count                    = (metadata::jsonb ->> 'viewer_count')::integer,
+    follower_count                  = (metadata::jsonb ->> 'follower_count')::integer,
+    subscriber_count                = (metadata::jsonb ->> 'subscriber_count')::integer,
+    message_count                   = (metadata::jsonb ->> 'message_count')::integer,
+    very_negative_message_count     = (metadata::jsonb ->> 'very_negative_message_count')::integer,
+    negative_message_count          = (metadata::jsonb ->> 'negative_message_count')::integer,
+    slightly_negative_message_count = (metadata::jsonb ->> 'slightly_negative_message_count')::integer,
+    neutral_message_count           = (metadata::jsonb ->> 'neutral_message_count')::integer,
+    slightly_positive_message_count = (metadata::jsonb ->> 'slightly_positive_message_count')::integer,
+    positive_message_count          = (metadata::jsonb ->> 'positive_message_count')::integer,
+    very_positive_message_count     = (metadata::jsonb ->> 'very_positive_message_count')::integer
+WHERE metadata IS NOT NULL AND viewer_count IS NULL;
+
+-- Once the backfill is verified the blob can go:
+-- ALTER TABLE stream_metadata DROP COLUMN metadata;
@@ -0,0 +1,22 @@
+-- Composite indexes matching the filters and orderings of the Lambda queries.
+-- lambda/tests/test_query_plans.py checks that none of those queries falls back to a sequential scan.
+-- On a large live table create them with CREATE INDEX CONCURRENTLY outside a transaction instead.
+
+-- get-messages-data: broadcaster + chatter, time range, keyset order (timestamp, id)
+CREATE INDEX IF NOT EXISTS messages_broadcaster_chatter_timestamp_idx
+    ON messages (broadcaster_user_login, chatter_user_login, timestamp, id);
+
+-- get-messages-data and get-messages-stats filtered by stream
+CREATE INDEX IF NOT EXISTS messages_broadcaster_stream_timestamp_idx
+    ON messages (broadcaster_user_login, stream_id, timestamp, id);
+
+-- get-messages-stats over all streams of a broadcaster in a time range
+CREATE INDEX IF NOT EXISTS messages_broadcaster_timestamp_idx
+    ON messages (broadcaster_user_login, timestamp, id);
+
+-- get-stream lists the streams of a broadcaster, lookups by stream_id use the primary key
+CREATE INDEX IF NOT EXISTS streams_broadcaster_started_at_idx
+    ON streams (broadcaster_username, started_at);
+
+-- stream_metadata is read and deleted by stream_id (+ time range) through
+-- stream_metadata_stream_id_timestamp_key from V004__idempotent_inserts.sql
@@ -0,0 +1,103 @@
+-- messages becomes a table partitioned by month of timestamp (messages_pYYYYMM partitions).
+-- Queries with a time range only touch the matching partitions, and retention drops whole
+-- partitions (twitchChatAnalytics-messages-retention) instead of deleting rows.
+-- Unique keys of a partitioned table must contain the partition key, so the primary key becomes
+-- (id, timestamp) and the message_id dedupe key (message_id, timestamp); a redelivered message
+-- carries the same timestamp, so ON CONFLICT (message_id, timestamp) still skips it.
+
+-- Creates the missing monthly partitions from from_month up to and including to_month.
+-- Rows of a month that already landed in messages_default are moved into its new partition in the
+-- same transaction; attaching fails while the default partition still holds rows of the range.
+CREATE OR REPLACE FUNCTION create_messages_partitions(from_month DATE, to_month DATE) RETURNS INTEGER AS $$
+DECLARE
+    month DATE := date_trunc('month', from_month);
+    next_month DATE;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    WHILE month <= to_month LOOP
+        next_month := (month + INTERVAL '1 month')::DATE;
+        partition_name := format('messages_p%s', to_char(month, 'YYYYMM'));
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I (LIKE messages INCLUDING DEFAULTS)', partition_name);
+            IF to_regclass('messages_default') IS NOT NULL THEN
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM messages_default WHERE timestamp >= %L AND timestamp < %L RETURNING *) '
+                    'INSERT INTO %I SELECT * FROM moved',
+                    month, next_month, partition_name
+                );
+            END IF;
+            EXECUTE format(
+                'ALTER TABLE messages ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month, next_month
+            );
+            created := created + 1;
+        END IF;
+        month := next_month;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    id_sequence TEXT;
+    first_month DATE;
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'messages'::regclass) THEN
+        RETURN;
+    END IF;
+
+    -- The id sequence would be dropped with the old table
+    id_sequence := pg_get_serial_sequence('messages', 'id');
+    EXECUTE format('ALTER SEQUENCE %s OWNED BY NONE', id_sequence);
+
+    ALTER TABLE messages RENAME TO messages_unpartitioned;
+    -- Index names are unique per schema, the new primary key takes over messages_pkey
+    ALTER TABLE messages_unpartitioned RENAME CONSTRAINT messages_pkey TO messages_unpartitioned_pkey;
+
+    EXECUTE format($ddl$
+        CREATE TABLE messages (
+            id                      BIGINT       NOT NULL DEFAULT nextval(%L),
+            stream_id               VARCHAR(255),
+            broadcaster_user_login  VARCHAR(255) NOT NULL,
+            chatter_user_login      VARCHAR(255) NOT NULL,
+            message_text            TEXT,
+            timestamp               TIMESTAMPTZ  NOT NULL,
+            nlp_classification      VARCHAR(50),
+            sentiment_score         DOUBLE PRECISION,
+            sentiment_magnitude     DOUBLE PRECISION,
+            message_id              VARCHAR(255),
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    $ddl$, id_sequence);
+    EXECUTE format('ALTER SEQUENCE %s OWNED BY messages.id', id_sequence);
+
+    -- Catches timestamps outside the created months, the retention job keeps months ahead created
+    CREATE TABLE messages_default PARTITION OF messages DEFAULT;
+
+    SELECT COALESCE(min(timestamp), now())::DATE INTO first_month FROM messages_unpartitioned;
+    PERFORM create_messages_partitions(first_month, (now() + INTERVAL '2 months')::DATE);
+
+    INSERT INTO messages (
+        id, stream_id, broadcaster_user_login, chatter_user_login, message_text,
+        timestamp, nlp_classification, sentiment_score, sentiment_magnitude, message_id
+    )
+    SELECT
+        id, stream_id, broadcaster_user_login, chatter_user_login, message_text,
+        timestamp, nlp_classification, sentiment_score, sentiment_magnitude, message_id
+    FROM messages_unpartitioned;
+
+    DROP TABLE messages_unpartitioned;
+END;
+$$;
+
+-- Recreated on the partitioned table, created on every partition
+CREATE UNIQUE INDEX IF NOT EXISTS messages_message_id_key
+    ON messages (message_id, timestamp);
+CREATE INDEX IF NOT EXISTS messages_broadcaster_chatter_timestamp_idx
+    ON messages (broadcaster_user_login, chatter_user_login, timestamp, id);
+CREATE INDEX IF NOT EXISTS messages_broadcaster_stream_timestamp_idx
+    ON messages (broadcaster_user_login, stream_id, timestamp, id);
+CREATE INDEX IF NOT EXISTS messages_broadcaster_timestamp_idx
+    ON messages (broadcaster_user_login, timestamp, id);
@@ -0,0 +1,5 @@
+-- Where sentiment_score and sentiment_magnitude come from: the sentiment backend of messages-post-lambda
+-- ('google', 'lexicon') or 'lexicon_pre_classifier' for trivial messages scored locally.
+-- Pre-classified rows are left out of re-classification and of the corpora that validate the pre-classifier.
+-- Older rows keep NULL, their source is unknown.
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS sentiment_source VARCHAR(50);
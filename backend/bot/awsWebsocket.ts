@@ -23,6 +23,23 @@ interface AwsWebsocketResponse {
     data?: unknown;
 }
 
+function handleNlpMessage(cognitoUserId: string, nlpMessage: object) {
+    const message: WebsocketPayload = {
+        type: WEBSOCKET_MESSAGE_TYPE.NLP_MESSAGE,
+        messageObject: nlpMessage
+    }
+    sendMessageToFrontendClient(cognitoUserId, message);
+
+    const nlpClassification = (nlpMessage as any)?.nlp_classification;
+    const convertedNlpClassification = Object.values(SentimentLabel).includes(nlpClassification as SentimentLabel) ? nlpClassification as SentimentLabel : undefined;
+    if (convertedNlpClassification == undefined) {
+        logger.error("Converted NLP Classification is undefined", LOG_PREFIX);
+    }
+    else{
+        incrementSentimentMessageCount(cognitoUserId, convertedNlpClassification);
+    }
+}
+
 export function connectAwsWebSocket(twitchUsername: string, cognitoUserId: string): WebSocket | null {
     try {
         const cognitoData = frontendClients.get(cognitoUserId)?.cognito;
@@ -64,22 +81,13 @@ export function connectAwsWebSocket(twitchUsername: string, cognitoUserId: strin
                 logger.info(`Received message: ${IS_DEBUG_ENABLED ? JSON.stringify(data, null, 2) : ""}`,LOG_PREFIX, {color: LogColor.YELLOW, style: LogStyle.BOLD});
 
                 if (data.type === NLP_MESSAGE_WEBSOCKET_TYPE && data.data) {
-                    const message: WebsocketPayload = {
-                        type: WEBSOCKET_MESSAGE_TYPE.NLP_MESSAGE,
-                        messageObject: data.data
-                    }
-                    sendMessageToFrontendClient(cognitoUserId, message);
-
-                    const nlpClassification = (data.data as any)?.nlp_classification;
-                    const convertedNlpClassification = Object.values(SentimentLabel).includes(nlpClassification as SentimentLabel) ? nlpClassification as SentimentLabel : undefined;
-                    if (convertedNlpClassification == undefined) {
-                        logger.error("Converted NLP Classification is undefined", LOG_PREFIX);
-                    }
-                    else{
-                        incrementSentimentMessageCount(cognitoUserId, convertedNlpClassification);
+                    // batched frames carry an array of messages of one broadcaster
+                    const nlpMessages: object[] = Array.isArray(data.data) ? data.data : [data.data];
+                    for (const nlpMessage of nlpMessages) {
+                        handleNlpMessage(cognitoUserId, nlpMessage);
                     }
 
-                    logger.info(`Message sent to frontend client`, LOG_PREFIX, {color: LogColor.YELLOW});
+                    logger.info(`${nlpMessages.length} message(s) sent to frontend client`, LOG_PREFIX, {color: LogColor.YELLOW});
                 }
             } catch (error) {
                 logger.info(`Received message: ${message.toString()}`, LOG_PREFIX, {color: LogColor.YELLOW, style: LogStyle.BOLD});
@@ -5,3 +5,4 @@ import {awsTwitchMessageController} from "./controller/awsTwitchMessageControlle
 export const awsTwitchMessageRouter = express.Router();
 
 awsTwitchMessageRouter.get('/', createHandlerWithContext(awsTwitchMessageController.getTwitchMessages));
+awsTwitchMessageRouter.get('/stats', createHandlerWithContext(awsTwitchMessageController.getTwitchMessageStats));
@@ -25,15 +25,16 @@ class AwsStreamMetadataController {
 
     @TCASecured({
         requiredQueryParams: ["stream_id"],
+        optionalQueryParams: ["fields", "from", "to", "resolution", "start_time", "end_time"],
         requiredHeaders: ["authorization", "broadcasteruserlogin"],
         requiredRole: COGNITO_ROLES.MODERATOR,
         actionDescription: "Get Stream Metadata"
     })
     public async getStreamMetadata(req: express.Request, res: express.Response, next: express.NextFunction, context: any) {
-        const {queryParams, headers} = context;
+        const {queryParams, optionalQueryParams, headers} = context;
         try{
 
-            const result =  await getStreamMetadataByStreamIdFromApiGateway(queryParams, headers)
+            const result =  await getStreamMetadataByStreamIdFromApiGateway({...queryParams, ...optionalQueryParams}, headers)
             logger.info("Successfully get stream-metadata", LOG_PREFIX, { color: LogColor.YELLOW, style: LogStyle.DIM });
             res.json(result);
         }
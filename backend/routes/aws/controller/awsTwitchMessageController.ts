@@ -3,21 +3,24 @@ import express from "express";
 import {LogColor, logger, LogStyle} from "../../../utilities/logger";
 import {IS_DEBUG_ENABLED} from "../../../entryPoint";
 import {getTwitchMessageFromApiGateway,} from "../../../api_gateway_calls/twitch-message/getTwitchMessage";
-import {GetTwitchMessageResponse, TwitchMessageData} from "../model/getTwitchMessageResponse";
+import {GetTwitchMessageResponse, TwitchMessageData, TwitchMessagePage} from "../model/getTwitchMessageResponse";
 import {ErrorWithStatus} from "../../../utilities/ErrorWithStatus";
 import {getClientAndCognitoIdToken} from "../../../websocket/frontendClients";
 import {TwitchMessage} from "../model/twitchMessage";
 import {PostTwitchMessagePayload} from "../model/postTwitchMessagePayload";
 import {postMessageToApiGateway} from "../../../api_gateway_calls/twitch-message/postTwitchMessage";
 import {COGNITO_ROLES} from "../../../utilities/CognitoRoleEnum";
+import {getTwitchMessageStatsFromApiGateway} from "../../../api_gateway_calls/twitch-message/getTwitchMessageStats";
 
 const LOG_PREFIX = "AWS_TWITCH_MESSAGE_CONTROLLER"
+// Largest page get-messages-data serves (MAX_PAGE_LIMIT), fewest round trips when following next_cursor
+const MESSAGE_PAGE_LIMIT = 5000
 
 class AwsTwitchMessageController {
 
     @TCASecured({
         requiredQueryParams: ["chatter_user_login"],
-        optionalQueryParams: ["stream_id", "start_time", "end_time"],
+        optionalQueryParams: ["stream_id", "start_time", "end_time", "limit", "after"],
         requiredHeaders: ["authorization", "broadcasteruserlogin", "x-twitch-oauth-token"],
         requiredRole: COGNITO_ROLES.MODERATOR,
         actionDescription: "Get TwitchMessages"
@@ -25,11 +28,16 @@ class AwsTwitchMessageController {
     public async getTwitchMessages(req: express.Request, res: express.Response, next: express.NextFunction, context: any) {
         const {queryParams, optionalQueryParams, headers, cognitoUserId} = context;
         try{
-            const result = await getTwitchMessageFromApiGateway({...queryParams, ...optionalQueryParams}, headers);
+            const params = {...queryParams, ...optionalQueryParams};
+            // Callers without limit/after expect the whole history, not only its first page
+            const result = params.limit || params.after
+                ? await getTwitchMessageFromApiGateway(params, headers)
+                : await AwsTwitchMessageController.getAllTwitchMessages(params, headers);
 
             const response = await AwsTwitchMessageController.buildResponse(
-                result,
+                result.messages,
                 queryParams.chatter_user_login,
+                result.next_cursor,
             );
 
             logger.info("Successfully get twitch messages", LOG_PREFIX, { color: LogColor.YELLOW, style: LogStyle.DIM });
@@ -53,11 +61,53 @@ class AwsTwitchMessageController {
         }
     }
 
+    @TCASecured({
+        optionalQueryParams: ["stream_id", "chatter_user_login", "start_time", "end_time", "bucket", "chatter_limit", "summary"],
+        requiredHeaders: ["authorization", "broadcasteruserlogin", "x-twitch-oauth-token"],
+        requiredRole: COGNITO_ROLES.MODERATOR,
+        actionDescription: "Get TwitchMessage stats"
+    })
+    public async getTwitchMessageStats(req: express.Request, res: express.Response, next: express.NextFunction, context: any) {
+        const {optionalQueryParams, headers} = context;
+        try{
+            const result = await getTwitchMessageStatsFromApiGateway({...optionalQueryParams}, headers);
+
+            logger.info("Successfully get twitch message stats", LOG_PREFIX, { color: LogColor.YELLOW, style: LogStyle.DIM });
+            if (!result) {
+                res.status(204).send();
+                return;
+            }
+            res.status(200).json(result);
+        }
+        catch (error: any) {
+            logger.error(`Error in get /twitch-messages/stats: ${error}. ${IS_DEBUG_ENABLED ? JSON.stringify(error.response, null, 2) : ""}`, LOG_PREFIX);
+            res.status(error.response.status).json({
+                error: `Failed to fetch twitch message stats: ${JSON.stringify(error.response.data)}`,
+            });
+        }
+    }
+
+    private static async getAllTwitchMessages(params: any, headers: any): Promise<TwitchMessagePage> {
+        const messages: TwitchMessageData[] = [];
+        let after: string | null = null;
+        do {
+            const page: TwitchMessagePage = await getTwitchMessageFromApiGateway(
+                after ? {...params, limit: MESSAGE_PAGE_LIMIT, after} : {...params, limit: MESSAGE_PAGE_LIMIT},
+                headers
+            );
+            messages.push(...(page.messages ?? []));
+            after = page.next_cursor;
+        } while (after);
+
+        return {messages, next_cursor: null};
+    }
+
     private static async buildResponse(
         messages: TwitchMessageData[],
         chatterUserLogin: string,
+        nextCursor: string | null,
     ): Promise<GetTwitchMessageResponse> {
-        return {chatter_user_login: chatterUserLogin, messages};
+        return {chatter_user_login: chatterUserLogin, messages, next_cursor: nextCursor};
     }
 
     // for internal use only
@@ -2,6 +2,7 @@ export interface DeleteStreamMetadataResponse {
     message?: string;
     details?: {
         streams_deleted: number,
-        metadata_deleted: number
+        metadata_deleted: number,
+        messages_deleted: number
     }
 }
\ No newline at end of file
@@ -1,6 +1,8 @@
 export interface GetStreamMetadataResponse {
     "stream_id": string,
     "timestamp": string,
+    "resolution_seconds": number,
+    "sample_count": number,
     "metadata": StreamMetadata
 }
 
@@ -10,7 +12,11 @@ export interface StreamMetadata {
     "message_count"?: number
     "follower_count"?: number
     "subscriber_count"?: number
-    "neutral_message_count"?: number
+    "very_negative_message_count"?: number
     "negative_message_count"?: number
+    "slightly_negative_message_count"?: number
+    "neutral_message_count"?: number
+    "slightly_positive_message_count"?: number
     "positive_message_count"?: number
+    "very_positive_message_count"?: number
 }
\ No newline at end of file
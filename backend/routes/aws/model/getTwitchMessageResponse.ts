@@ -1,6 +1,12 @@
 export interface GetTwitchMessageResponse {
     chatter_user_login: string;
     messages: TwitchMessageData[];
+    next_cursor: string | null;
+}
+
+export interface TwitchMessagePage {
+    messages: TwitchMessageData[];
+    next_cursor: string | null;
 }
 
 export interface TwitchMessageData {
@@ -0,0 +1,25 @@
+export interface GetTwitchMessageStatsResponse {
+    bucket: "1m" | "5m" | "1h";
+    message_count: number;
+    // only in stream summaries (summary=true)
+    unique_chatter_count?: number;
+    classifications: ClassificationCounts;
+    // not included in stream summaries
+    chatters?: ChatterStats[];
+    time_buckets: TimeBucketStats[];
+}
+
+export type ClassificationCounts = Record<string, number>;
+
+export interface ChatterStats {
+    chatter_user_login: string;
+    message_count: number;
+    classifications: ClassificationCounts;
+}
+
+export interface TimeBucketStats {
+    bucket: string;
+    message_count: number;
+    unique_chatter_count?: number;
+    classifications: ClassificationCounts;
+}